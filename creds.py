@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from typing import Iterator
 
 from dotenv import load_dotenv
 
@@ -33,6 +34,21 @@ def get_user_token_path(user_id: int) -> Path:
     return GOOGLE_TOKEN_BASE_DIR / f"token_{user_id}.json"
 
 
+def iter_token_user_ids(base_dir: Path) -> Iterator[int]:
+    """Yield the user IDs of ``token_<id>.json`` files directly under ``base_dir``."""
+
+    if not base_dir.exists():
+        return
+    with os.scandir(base_dir) as entries:
+        for entry in entries:
+            name = entry.name
+            if not (name.startswith("token_") and name.endswith(".json")):
+                continue
+            suffix = name[6:-5]
+            if suffix.isdigit():
+                yield int(suffix)
+
+
 def _resolve_default_token_path() -> Path:
     token_file_env = os.getenv("GOOGLE_TOKEN_FILE")
     if token_file_env:
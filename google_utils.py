@@ -11,6 +11,7 @@ from security.token_store import (
     configure_gauth as _configure_gauth,
     ensure_token_storage as _ensure_token_storage,
     prepare_gauth,
+    prepare_gauth_async,
     refresh_gauth as _refresh_gauth,
     store_gauth as _store_gauth,
     token_store,
@@ -43,13 +44,7 @@ def store_user_gauth(user_id: int, gauth: GoogleAuth) -> TokenLoadResult:
     return _store_gauth(user_id, gauth)
 
 
-def prepare_user_gauth(user_id: int, token_file: str | Path) -> TokenLoadResult:
-    """Prepare the GoogleAuth object for ``user_id`` with safety checks.
-
-    The caller-provided ``token_file`` is ignored if it differs from the
-    repository-defined location to prevent path traversal or cross-user access.
-    """
-
+def _warn_on_path_override(user_id: int, token_file: str | Path) -> None:
     resolved_path = Path(token_file).expanduser()
     expected_path = token_store().get_token_path(user_id)
     if resolved_path != expected_path:
@@ -60,13 +55,35 @@ def prepare_user_gauth(user_id: int, token_file: str | Path) -> TokenLoadResult:
             expected_path,
         )
 
-    result = prepare_gauth(user_id)
+
+def _log_token_state(user_id: int, result: TokenLoadResult) -> None:
     if result.state is TokenState.CORRUPTED:
         logger.warning("Token for user %s is corrupted or quarantined", user_id)
     elif result.state is TokenState.ABSENT:
         logger.info("Token for user %s is absent", user_id)
     elif result.state is TokenState.REFRESH_FAILED:
         logger.warning("Token refresh failed for user %s", user_id)
+
+
+def prepare_user_gauth(user_id: int, token_file: str | Path) -> TokenLoadResult:
+    """Prepare the GoogleAuth object for ``user_id`` with safety checks.
+
+    The caller-provided ``token_file`` is ignored if it differs from the
+    repository-defined location to prevent path traversal or cross-user access.
+    """
+
+    _warn_on_path_override(user_id, token_file)
+    result = prepare_gauth(user_id)
+    _log_token_state(user_id, result)
+    return result
+
+
+async def prepare_user_gauth_async(user_id: int, token_file: str | Path) -> TokenLoadResult:
+    """Async counterpart of :func:`prepare_user_gauth` for event-loop callers."""
+
+    _warn_on_path_override(user_id, token_file)
+    result = await prepare_gauth_async(user_id)
+    _log_token_state(user_id, result)
     return result
 
 
@@ -78,4 +95,5 @@ __all__ = [
     "refresh_user_gauth",
     "store_user_gauth",
     "prepare_user_gauth",
+    "prepare_user_gauth_async",
 ]
@@ -12,7 +12,7 @@ from google_utils import (
     TokenState,
     configure_gauth,
     ensure_token_storage,
-    prepare_user_gauth,
+    prepare_user_gauth_async,
     store_user_gauth,
 )
 from plugins import TEXT
@@ -67,7 +67,7 @@ async def auth(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     try:
         user_id = _resolve_user_id(update)
         token_file_path = str(get_user_token_path(user_id))
-        token_result = prepare_user_gauth(user_id, token_file_path)
+        token_result = await prepare_user_gauth_async(user_id, token_file_path)
         gauth = token_result.gauth
 
         if token_result.state is TokenState.ABSENT or gauth is None:
@@ -29,7 +29,7 @@ from message_utils import (
 )
 from plugins import TEXT
 from upload import upload as upload_to_drive
-from google_utils import TokenState, prepare_user_gauth
+from google_utils import TokenState, prepare_user_gauth_async
 
 CACHE_DIR = Path(CACHE_DIRECTORY).expanduser()
 
@@ -91,7 +91,7 @@ async def handle_file_message(update: Update, context: ContextTypes.DEFAULT_TYPE
     user_role = get_user_role(user_id)
 
     token_file_path = str(get_user_token_path(user_id))
-    token_result = prepare_user_gauth(user_id, token_file_path)
+    token_result = await prepare_user_gauth_async(user_id, token_file_path)
     gauth = token_result.gauth
 
     if token_result.state is not TokenState.VALID or gauth is None:
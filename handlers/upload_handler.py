@@ -19,7 +19,7 @@ from plugins.wdl import wget_dl
 from pySmartDL import SmartDL
 from upload import upload as upload_to_drive
 from mega import Mega
-from google_utils import TokenState, prepare_user_gauth
+from google_utils import TokenState, prepare_user_gauth_async
 from pydrive2.auth import GoogleAuth
 UPLOAD_FAIL_PROMPT = format_error("上传失败，请检查授权或网络。")
 
@@ -111,7 +111,7 @@ async def upload(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_role = get_user_role(user_id)
 
     token_file_path = str(get_user_token_path(user_id))
-    token_result = prepare_user_gauth(user_id, token_file_path)
+    token_result = await prepare_user_gauth_async(user_id, token_file_path)
     gauth = token_result.gauth
 
     if token_result.state is not TokenState.VALID or gauth is None:
@@ -12,6 +12,14 @@ from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequenc
 
 RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "7"))
 LOG_DIR = Path(os.getenv("LOG_DIRECTORY", "logs")).expanduser()
+# Security audit entries are on unless explicitly disabled; callers skip the
+# audit bookkeeping entirely when this is False.
+SECURITY_AUDIT_ENABLED = os.getenv("SECURITY_AUDIT_ENABLED", "1").strip().lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
 
 _LAST_CLEANUP: Optional[date] = None
 
@@ -28,6 +28,18 @@ logger = logging.getLogger(__name__)
 ROLES_ORDER = {"user": 0, "admin": 1, "super_admin": 2}
 
 _store: Dict[str, Dict[str, Any]] = {"users": {}}
+# Bumped whenever role assignments or the super admin whitelist change so
+# callers caching role lookups know when to rebuild.
+_roles_version = 0
+
+
+def _bump_roles_version() -> None:
+    global _roles_version
+    _roles_version += 1
+
+
+def roles_version() -> int:
+    return _roles_version
 
 
 class AdminWhitelistManager:
@@ -55,6 +67,7 @@ class AdminWhitelistManager:
                 return False
             self._ids = self._load_ids()
             self._mtime = current_mtime
+            _bump_roles_version()
             self._last_reload = datetime.now(timezone.utc)
             payload = {
                 "event": "admin_whitelist_reload",
@@ -165,6 +178,7 @@ def _load_store() -> None:
     # Ensure default super admins remain
     for uid in DEFAULT_SUPER_ADMINS:
         _store["users"].setdefault(str(uid), {"role": "super_admin"})
+    _bump_roles_version()
 
 
 def _save_store() -> None:
@@ -188,6 +202,7 @@ def set_user_role(target_id: int, role: str, name: Optional[str] = None) -> None
         _load_store()
     _store["users"][str(target_id)] = {"role": role, "name": name}
     _save_store()
+    _bump_roles_version()
 
 
 def remove_user(target_id: int) -> bool:
@@ -198,6 +213,7 @@ def remove_user(target_id: int) -> bool:
     removed = _store["users"].pop(str(target_id), None)
     if removed is not None:
         _save_store()
+        _bump_roles_version()
         return True
     return False
 
@@ -4,19 +4,21 @@ import logging
 import time
 import uuid
 from functools import wraps
+from types import MappingProxyType
 from typing import Any, Awaitable, Callable
 
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from monitoring import log_security_audit
+from monitoring import SECURITY_AUDIT_ENABLED, log_security_audit
 from permissions import get_user_role
 
 from .manager import AccessDecision, PermissionManager, SecurityLevel, permission_manager
 
 logger = logging.getLogger(__name__)
 
-DENIAL_MESSAGES = {
+# Read-only view so handlers cannot alter the user-facing copy at runtime.
+DENIAL_MESSAGES = MappingProxyType({
     AccessDecision.DENY_UNAUTHORIZED_MISSING_USER:
         "❌ I couldn't verify who requested this. Please try again in a private chat.",
     AccessDecision.DENY_UNAUTHORIZED_TOKEN_MISSING:
@@ -29,15 +31,7 @@ DENIAL_MESSAGES = {
         "❌ You're sending requests too quickly. Please slow down and try again.",
     AccessDecision.POLICY_ERROR_UNSUPPORTED_LEVEL:
         "❌ This request isn't supported. Please contact an administrator.",
-}
-
-
-def _resolve_ids(update: Update) -> tuple[int | None, int | None]:
-    user_id = update.effective_user.id if update.effective_user else None
-    chat_id = update.effective_chat.id if update.effective_chat else None
-    if user_id is None:
-        user_id = chat_id
-    return user_id, chat_id
+})
 
 
 async def _send_denial(update: Update, context: ContextTypes.DEFAULT_TYPE, message: str) -> None:
@@ -58,35 +52,45 @@ def secure(
     """Wrap a handler with whitelist/token enforcement."""
 
     def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        evaluate = manager.evaluator_for(level)
+
         @wraps(func)
         async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args: Any, **kwargs: Any) -> Any:
-            user_id, chat_id = _resolve_ids(update)
-            started = time.perf_counter()
-            decision: AccessDecision = manager.evaluate_access(user_id, level)
+            # Each effective_* property is read once and reused below.
+            effective_user = update.effective_user
+            effective_chat = update.effective_chat
+            chat_id = effective_chat.id if effective_chat else None
+            user_id = effective_user.id if effective_user else None
+            if user_id is None:
+                user_id = chat_id
+            audit_enabled = SECURITY_AUDIT_ENABLED
+            started = time.perf_counter() if audit_enabled else 0.0
+            decision: AccessDecision = evaluate(user_id)
+            if audit_enabled:
+                # Snapshot the versions the decision was made against; a reload
+                # during a long handler must not relabel the allow entry.
+                policy_version = getattr(manager, "policy_version", None)
+                whitelist_version = getattr(manager, "whitelist_version", None)
             role = get_user_role(user_id) if user_id is not None else "unknown"
-            chat_type = (
-                update.effective_chat.type if update.effective_chat else "unknown"
-            )
-            policy_version = getattr(manager, "policy_version", None)
-            whitelist_version = getattr(manager, "whitelist_version", None)
+            chat_type = effective_chat.type if effective_chat else "unknown"
             corr_id = uuid.uuid4().hex
 
             if not decision.allowed:
                 message = DENIAL_MESSAGES.get(decision.reason, "❌ Unable to perform this action.")
                 await _send_denial(update, context, message)
-                duration_ms = (time.perf_counter() - started) * 1000
-                log_security_audit(
-                    ts=None,
-                    user_id=user_id,
-                    chat_type=chat_type,
-                    command=command_name,
-                    decision="deny",
-                    reason=decision.reason,
-                    duration_ms=duration_ms,
-                    policy_version=policy_version,
-                    whitelist_version=whitelist_version,
-                    corr_id=corr_id,
-                )
+                if audit_enabled:
+                    log_security_audit(
+                        ts=None,
+                        user_id=user_id,
+                        chat_type=chat_type,
+                        command=command_name,
+                        decision="deny",
+                        reason=decision.reason,
+                        duration_ms=(time.perf_counter() - started) * 1000,
+                        policy_version=policy_version,
+                        whitelist_version=whitelist_version,
+                        corr_id=corr_id,
+                    )
                 logger.info(
                     "Denied %s for user=%s reason=%s level=%s chat=%s",
                     command_name,
@@ -100,19 +104,19 @@ def secure(
             try:
                 result = await func(update, context, *args, **kwargs)
             finally:
-                duration_ms = (time.perf_counter() - started) * 1000
-                log_security_audit(
-                    ts=None,
-                    user_id=user_id,
-                    chat_type=chat_type,
-                    command=command_name,
-                    decision="allow",
-                    reason=decision.reason,
-                    duration_ms=duration_ms,
-                    policy_version=policy_version,
-                    whitelist_version=whitelist_version,
-                    corr_id=corr_id,
-                )
+                if audit_enabled:
+                    log_security_audit(
+                        ts=None,
+                        user_id=user_id,
+                        chat_type=chat_type,
+                        command=command_name,
+                        decision="allow",
+                        reason=decision.reason,
+                        duration_ms=(time.perf_counter() - started) * 1000,
+                        policy_version=policy_version,
+                        whitelist_version=whitelist_version,
+                        corr_id=corr_id,
+                    )
                 logger.debug(
                     "Access granted for %s via %s (user=%s role=%s corr_id=%s)",
                     command_name,
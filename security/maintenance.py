@@ -2,18 +2,20 @@ from __future__ import annotations
 
 import contextlib
 import logging
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 from telegram.ext import CallbackContext
 
-from creds import get_google_token_base_dir
+from creds import get_google_token_base_dir, iter_token_user_ids
 from monitoring import log_activity, log_system_info, trigger_admin_alert
 from security.token_store import (
     TokenLoadResult,
     TokenState,
+    TokenStore,
     token_store,
 )
 
@@ -21,6 +23,13 @@ logger = logging.getLogger(__name__)
 
 DEFAULT_BATCH_SIZE = 10
 DEFAULT_REFRESH_AHEAD = timedelta(hours=1)
+MAX_WORKERS = 8
+
+# Building the metrics payload and the two or three JSON appends to the
+# monitoring log (system info, activity and, on issues, an admin alert) run on
+# a dedicated worker. The job callback returns once the batch is processed
+# instead of waiting on that file I/O.
+_LOG_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="maint-log")
 
 
 @dataclass
@@ -32,6 +41,10 @@ class _MaintenanceMetrics:
     quarantined: int = 0
     skipped: int = 0
 
+    def merge(self, other: _MaintenanceMetrics) -> None:
+        for field in fields(self):
+            setattr(self, field.name, getattr(self, field.name) + getattr(other, field.name))
+
     @property
     def success_rate(self) -> float:
         if not self.refresh_attempts:
@@ -39,16 +52,10 @@ class _MaintenanceMetrics:
         return self.refreshed / self.refresh_attempts
 
 
-def _collect_token_ids() -> List[int]:
-    store = token_store()
+def _collect_token_ids(store: TokenStore) -> List[int]:
     user_ids = set(store._cache.keys())  # type: ignore[attr-defined]
 
-    base_dir = get_google_token_base_dir()
-    if base_dir.exists():
-        for path in base_dir.glob("token_*.json"):
-            suffix = path.stem.split("token_")[-1]
-            if suffix.isdigit():
-                user_ids.add(int(suffix))
+    user_ids.update(iter_token_user_ids(get_google_token_base_dir()))
 
     return sorted(user_ids)
 
@@ -62,16 +69,16 @@ def _select_batch(
         return [], cursor
 
     total = len(user_ids)
-    start = cursor % total if total else 0
+    start = cursor % total
     count = min(batch_size, total)
+    end = start + count
 
-    selected: List[int] = []
-    index = start
-    for _ in range(count):
-        selected.append(user_ids[index])
-        index = (index + 1) % total
+    selected = list(user_ids[start:end])
+    if end > total:
+        # The window wraps past the end of the ring; continue from the front.
+        selected.extend(user_ids[: end - total])
 
-    return selected, index
+    return selected, end % total
 
 
 def _normalize_expiry(expiry: Optional[datetime]) -> Optional[datetime]:
@@ -87,11 +94,13 @@ def _should_refresh(result: TokenLoadResult, refresh_ahead: timedelta) -> bool:
     if gauth is None:
         return False
 
-    if getattr(gauth, "access_token_expired", False):
+    # gauth is always a pydrive2 GoogleAuth; a missing attribute surfaces
+    # through _process_user's failure handling rather than being defaulted.
+    if gauth.access_token_expired:
         return True
 
-    credentials = getattr(gauth, "credentials", None)
-    expiry = _normalize_expiry(getattr(credentials, "token_expiry", None))
+    credentials = gauth.credentials
+    expiry = _normalize_expiry(credentials.token_expiry if credentials is not None else None)
     if expiry is None:
         return False
 
@@ -100,13 +109,12 @@ def _should_refresh(result: TokenLoadResult, refresh_ahead: timedelta) -> bool:
 
 
 def _handle_result(
+    store: TokenStore,
     user_id: int,
     result: TokenLoadResult,
     refresh_ahead: timedelta,
     metrics: _MaintenanceMetrics,
 ) -> TokenLoadResult:
-    store = token_store()
-
     if result.state is TokenState.ABSENT:
         return result
 
@@ -138,11 +146,11 @@ def _handle_result(
 
 
 def _process_user(
+    store: TokenStore,
     user_id: int,
     refresh_ahead: timedelta,
     metrics: _MaintenanceMetrics,
 ) -> Optional[TokenLoadResult]:
-    store = token_store()
     token_path = store.get_token_path(user_id)
     lock_path = token_path.with_suffix(token_path.suffix + ".maint.lock")
 
@@ -150,7 +158,7 @@ def _process_user(
         with store._file_lock(lock_path, timeout=5.0):  # type: ignore[attr-defined]
             result = store.prepare_gauth(user_id)
             metrics.processed += 1
-            final_result = _handle_result(user_id, result, refresh_ahead, metrics)
+            final_result = _handle_result(store, user_id, result, refresh_ahead, metrics)
             return final_result
     except TimeoutError:
         metrics.skipped += 1
@@ -179,36 +187,23 @@ def _serialize_metrics(
     }
 
 
-def run_token_health_check(context: CallbackContext) -> None:
-    job = getattr(context, "job", None)
-    job_data: Dict[str, object] = getattr(job, "data", {}) or {}
-
-    batch_size = int(job_data.get("batch_size", DEFAULT_BATCH_SIZE))
-    refresh_ahead = job_data.get("refresh_ahead", DEFAULT_REFRESH_AHEAD)
-    if not isinstance(refresh_ahead, timedelta):
-        refresh_ahead = timedelta(seconds=float(refresh_ahead))
-
-    cursor = int(job_data.get("cursor", 0))
-
-    user_ids = _collect_token_ids()
-    batch, next_cursor = _select_batch(user_ids, cursor, max(1, batch_size))
-
-    metrics = _MaintenanceMetrics()
-    results: List[TokenLoadResult] = []
-    for user_id in batch:
-        outcome = _process_user(user_id, refresh_ahead, metrics)
-        if outcome is not None:
-            results.append(outcome)
+def _emit_maintenance_logs(
+    metrics: _MaintenanceMetrics,
+    total_users: int,
+    results: List[TokenLoadResult],
+) -> None:
+    try:
+        _log_maintenance_outcome(metrics, total_users, results)
+    except Exception as exc:
+        logger.exception("Failed to emit token maintenance logs: %s", exc)
 
-    job_data.update({
-        "batch_size": batch_size,
-        "refresh_ahead": refresh_ahead,
-        "cursor": next_cursor,
-    })
-    if job is not None:
-        job.data = job_data
 
-    metrics_payload = _serialize_metrics(metrics, len(user_ids), results)
+def _log_maintenance_outcome(
+    metrics: _MaintenanceMetrics,
+    total_users: int,
+    results: List[TokenLoadResult],
+) -> None:
+    metrics_payload = _serialize_metrics(metrics, total_users, results)
     message = (
         "🔐 Token health check completed: processed={processed} refreshed={refreshed} "
         "failures={refresh_failures} quarantined={quarantined} skipped={skipped}"
@@ -240,6 +235,55 @@ def run_token_health_check(context: CallbackContext) -> None:
         trigger_admin_alert(alert_message)
 
 
+def run_token_health_check(context: CallbackContext) -> None:
+    job = getattr(context, "job", None)
+    job_data: Dict[str, object] = getattr(job, "data", {}) or {}
+
+    batch_size = int(job_data.get("batch_size", DEFAULT_BATCH_SIZE))
+    refresh_ahead = job_data.get("refresh_ahead", DEFAULT_REFRESH_AHEAD)
+    if not isinstance(refresh_ahead, timedelta):
+        refresh_ahead = timedelta(seconds=float(refresh_ahead))
+
+    cursor = int(job_data.get("cursor", 0))
+
+    store = token_store()
+    user_ids = _collect_token_ids(store)
+    batch, next_cursor = _select_batch(user_ids, cursor, max(1, batch_size))
+
+    metrics = _MaintenanceMetrics()
+    results: List[TokenLoadResult] = []
+    if batch:
+        # Users are independent and the work is I/O bound, so process the
+        # batch concurrently. Each task gets its own metrics object which is
+        # merged afterwards; per-user file locks still serialise work on the
+        # same token.
+        user_metrics = [_MaintenanceMetrics() for _ in batch]
+        with ThreadPoolExecutor(
+            max_workers=min(len(batch), MAX_WORKERS),
+            thread_name_prefix="token-maint",
+        ) as pool:
+            futures = [
+                pool.submit(_process_user, store, user_id, refresh_ahead, task_metrics)
+                for user_id, task_metrics in zip(batch, user_metrics)
+            ]
+            for future in futures:
+                outcome = future.result()
+                if outcome is not None:
+                    results.append(outcome)
+        for task_metrics in user_metrics:
+            metrics.merge(task_metrics)
+
+    job_data.update({
+        "batch_size": batch_size,
+        "refresh_ahead": refresh_ahead,
+        "cursor": next_cursor,
+    })
+    if job is not None:
+        job.data = job_data
+
+    _LOG_POOL.submit(_emit_maintenance_logs, metrics, len(user_ids), results)
+
+
 __all__ = [
     "DEFAULT_BATCH_SIZE",
     "DEFAULT_REFRESH_AHEAD",
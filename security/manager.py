@@ -3,17 +3,19 @@ from __future__ import annotations
 import hashlib
 import logging
 import os
+import random
+import re
+import threading
 import time
 from dataclasses import dataclass
 from enum import Enum
-from functools import lru_cache
 from pathlib import Path
-from typing import Iterable, Optional, Set, Tuple
+from typing import AbstractSet, Callable, Dict, FrozenSet, Iterable, Optional, Set, Tuple
 
 from dotenv import dotenv_values
 
-from creds import get_google_token_base_dir, get_user_token_path
-from permissions import has_permission
+from creds import get_google_token_base_dir, iter_token_user_ids
+from permissions import has_permission, roles_version
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +27,18 @@ DEFAULT_WHITELIST_KEYS: Tuple[str, ...] = (
     "WHITELIST",
 )
 
+# Spread token cache expiries by +/-20% so entries created together do not
+# all hit the filesystem again in the same instant.
+TOKEN_CACHE_JITTER = 0.2
+# Upper bound on cached token lookups; user IDs come from untrusted updates.
+TOKEN_CACHE_MAX_ENTRIES = 4096
+
+_jitter_random = random.Random()
+
+# One whitelist entry: a run of digits that fills a comma-separated field,
+# ignoring surrounding whitespace. Fields with any other content are skipped.
+_WHITELIST_ID_RE = re.compile(r"(?:^|,)\s*(\d+)\s*(?=,|$)")
+
 
 class SecurityLevel(Enum):
     PUBLIC = "public"
@@ -55,6 +69,17 @@ class AccessDecision:
     POLICY_ERROR_UNSUPPORTED_LEVEL = f"{POLICY_ERROR}/unsupported_level"
 
 
+# Decisions are immutable, so the evaluators hand out shared instances.
+_ALLOW_PUBLIC = AccessDecision(True, AccessDecision.ALLOW, via="public")
+_ALLOW_WHITELIST = AccessDecision(True, AccessDecision.ALLOW, via="whitelist")
+_ALLOW_TOKEN = AccessDecision(True, AccessDecision.ALLOW, via="token")
+_DENY_MISSING_USER = AccessDecision(False, AccessDecision.DENY_UNAUTHORIZED_MISSING_USER)
+_DENY_TOKEN_MISSING = AccessDecision(False, AccessDecision.DENY_UNAUTHORIZED_TOKEN_MISSING)
+_DENY_ADMIN_REQUIRED = AccessDecision(False, AccessDecision.DENY_UNAUTHORIZED_ADMIN_REQUIRED)
+_DENY_NOT_WHITELISTED = AccessDecision(False, AccessDecision.DENY_NOT_WHITELISTED)
+_DENY_UNSUPPORTED_LEVEL = AccessDecision(False, AccessDecision.POLICY_ERROR_UNSUPPORTED_LEVEL)
+
+
 class PermissionManager:
     """Centralise whitelist and token-driven access decisions."""
 
@@ -68,8 +93,15 @@ class PermissionManager:
         self._env_path = env_path
         self._whitelist_keys = tuple(dict.fromkeys(whitelist_keys))
         self._cache_ttl = max(1, cache_ttl_seconds)
-        self._whitelist_ids: Set[int] = set()
-        self._token_ids: Set[int] = set()
+        self._whitelist_ids: FrozenSet[int] = frozenset()
+        self._admin_ids: FrozenSet[int] = frozenset()
+        self._admin_ids_version: Optional[int] = None
+        self._token_ids: FrozenSet[int] = frozenset()
+        self._token_ids_snapshot_ts = 0.0
+        self._token_ids_lock = threading.Lock()
+        self._token_cache: Dict[int, Tuple[float, bool]] = {}
+        # Guards inserts and sweeps only; lookups read the dict without locking.
+        self._token_cache_lock = threading.Lock()
         self._token_base_dir = get_google_token_base_dir()
         self._policy_version = os.getenv(
             "SECURITY_POLICY_VERSION",
@@ -95,23 +127,36 @@ class PermissionManager:
                 values = dotenv_values(self._env_path)
             except Exception as exc:  # pragma: no cover - defensive logging
                 logger.warning("Failed to read %s: %s", self._env_path, exc)
-        ids: Set[int] = set()
+        parsed: Set[int] = set()
         for key in self._whitelist_keys:
             raw = (values.get(key) if values else None) or os.getenv(key) or ""
-            ids.update(self._parse_id_list(raw))
+            parsed.update(self._parse_id_list(raw))
+        ids = frozenset(parsed)
         if ids != self._whitelist_ids:
             logger.info("Loaded %s whitelist IDs: %s", len(ids), sorted(ids))
+        # Publish a fresh immutable snapshot so concurrent readers never
+        # observe a half-updated whitelist.
         self._whitelist_ids = ids
         self._whitelist_version = self._compute_whitelist_version(ids)
-        self._token_lookup.cache_clear()
+        self.invalidate_admin_cache()
+        self._evict_expired_token_cache()
+
+    def invalidate_admin_cache(self) -> None:
+        """Force the whitelisted admin set to be rebuilt on the next admin check."""
+
+        self._admin_ids_version = None
+
+    def _current_admin_ids(self) -> FrozenSet[int]:
+        version = roles_version()
+        if version != self._admin_ids_version:
+            self._admin_ids = frozenset(
+                user_id for user_id in self._whitelist_ids if has_permission(user_id, "admin")
+            )
+            self._admin_ids_version = version
+        return self._admin_ids
 
     def _preload_token_ids(self) -> None:
-        if not self._token_base_dir.exists():
-            return
-        for path in self._token_base_dir.glob("token_*.json"):
-            suffix = path.stem.split("token_")[-1]
-            if suffix.isdigit():
-                self._token_ids.add(int(suffix))
+        self._refresh_token_ids_snapshot()
         if self._token_ids:
             logger.info(
                 "Preloaded %s user token(s) from %s",
@@ -119,35 +164,47 @@ class PermissionManager:
                 self._token_base_dir,
             )
 
+    def _refresh_token_ids_snapshot(self, max_age: Optional[float] = None) -> None:
+        """Rebuild the known token IDs from a single scan of the token directory.
+
+        With ``max_age`` the scan is skipped when another caller refreshed the
+        snapshot while this one waited for the lock.
+        """
+
+        with self._token_ids_lock:
+            if max_age is not None and time.monotonic() - self._token_ids_snapshot_ts <= max_age:
+                return
+            self._token_ids = frozenset(iter_token_user_ids(self._token_base_dir))
+            self._token_ids_snapshot_ts = time.monotonic()
+
     @staticmethod
     def _parse_id_list(raw: str) -> Set[int]:
-        ids: Set[int] = set()
-        for part in raw.split(","):
-            candidate = part.strip()
-            if candidate.isdigit():
-                ids.add(int(candidate))
-        return ids
+        return {int(match) for match in _WHITELIST_ID_RE.findall(raw)}
 
     def is_whitelisted(self, user_id: int) -> bool:
         return user_id in self._whitelist_ids
 
     def has_token(self, user_id: int) -> bool:
-        token_path = get_user_token_path(user_id)
-        if user_id in self._token_ids and token_path.exists():
-            return True
-        if not token_path.exists():
-            self._token_ids.discard(user_id)
+        if time.monotonic() - self._token_ids_snapshot_ts > self._cache_ttl:
+            self._refresh_token_ids_snapshot(max_age=self._cache_ttl)
+        if user_id not in self._token_ids:
             return False
-        self._token_ids.add(user_id)
-        return True
+        # Quarantine and cleanup remove files without telling the manager, so
+        # positive snapshot hits are confirmed against the filesystem.
+        return (self._token_base_dir / f"token_{user_id}.json").exists()
 
     def register_token(self, user_id: int) -> None:
-        self._token_ids.add(user_id)
-        self._token_lookup.cache_clear()
+        with self._token_ids_lock:
+            self._token_ids = self._token_ids | {user_id}
+        # The caller has just stored the token, so the next check can skip
+        # the filesystem confirmation.
+        self._cache_token_state(user_id, True)
 
     def unregister_token(self, user_id: int) -> None:
-        self._token_ids.discard(user_id)
-        self._token_lookup.cache_clear()
+        with self._token_ids_lock:
+            self._token_ids = self._token_ids - {user_id}
+        with self._token_cache_lock:
+            self._token_cache.pop(user_id, None)
 
     @property
     def policy_version(self) -> str:
@@ -158,42 +215,95 @@ class PermissionManager:
         return self._whitelist_version
 
     def evaluate_access(self, user_id: Optional[int], level: SecurityLevel) -> AccessDecision:
-        if user_id is None:
-            return AccessDecision(False, AccessDecision.DENY_UNAUTHORIZED_MISSING_USER)
-
         if level is SecurityLevel.PUBLIC:
-            return AccessDecision(True, AccessDecision.ALLOW, via="public")
+            return self._evaluate_public(user_id)
+        if level is SecurityLevel.AUTHORIZED:
+            return self._evaluate_authorized(user_id)
+        if level is SecurityLevel.ADMIN:
+            return self._evaluate_admin(user_id)
+        return self._evaluate_unsupported(user_id)
 
-        is_whitelisted = self.is_whitelisted(user_id)
+    def evaluator_for(self, level: SecurityLevel) -> Callable[[Optional[int]], AccessDecision]:
+        """Return the access check specialised for ``level``.
 
+        ``secure`` resolves this once at decoration time so each request skips
+        the per-level dispatch.
+        """
+
+        if level is SecurityLevel.PUBLIC:
+            return self._evaluate_public
+        if level is SecurityLevel.AUTHORIZED:
+            return self._evaluate_authorized
         if level is SecurityLevel.ADMIN:
-            if not is_whitelisted:
-                return AccessDecision(False, AccessDecision.DENY_NOT_WHITELISTED)
-            if not has_permission(user_id, "admin"):
-                return AccessDecision(False, AccessDecision.DENY_UNAUTHORIZED_ADMIN_REQUIRED)
-            return AccessDecision(True, AccessDecision.ALLOW, via="whitelist")
+            return self._evaluate_admin
+        return self._evaluate_unsupported
 
-        if is_whitelisted:
-            return AccessDecision(True, AccessDecision.ALLOW, via="whitelist")
+    def _evaluate_public(self, user_id: Optional[int]) -> AccessDecision:
+        if user_id is None:
+            return _DENY_MISSING_USER
+        return _ALLOW_PUBLIC
 
-        if not self._has_token_cached(user_id):
-            return AccessDecision(False, AccessDecision.DENY_UNAUTHORIZED_TOKEN_MISSING)
+    def _evaluate_authorized(self, user_id: Optional[int]) -> AccessDecision:
+        return self._evaluate_whitelist_or_token(user_id, _ALLOW_TOKEN)
 
-        if level is SecurityLevel.AUTHORIZED:
-            return AccessDecision(True, AccessDecision.ALLOW, via="token")
+    def _evaluate_admin(self, user_id: Optional[int]) -> AccessDecision:
+        if user_id is None:
+            return _DENY_MISSING_USER
+        if not self.is_whitelisted(user_id):
+            return _DENY_NOT_WHITELISTED
+        if user_id not in self._current_admin_ids():
+            return _DENY_ADMIN_REQUIRED
+        return _ALLOW_WHITELIST
 
-        return AccessDecision(False, AccessDecision.POLICY_ERROR_UNSUPPORTED_LEVEL)
+    def _evaluate_unsupported(self, user_id: Optional[int]) -> AccessDecision:
+        return self._evaluate_whitelist_or_token(user_id, _DENY_UNSUPPORTED_LEVEL)
 
-    def _has_token_cached(self, user_id: int) -> bool:
-        bucket = int(time.time() // self._cache_ttl)
-        return self._token_lookup(bucket, user_id)
+    def _evaluate_whitelist_or_token(
+        self, user_id: Optional[int], token_decision: AccessDecision
+    ) -> AccessDecision:
+        """Shared whitelist/token checks; ``token_decision`` applies to token holders."""
 
-    @lru_cache(maxsize=1000)
-    def _token_lookup(self, bucket: int, user_id: int) -> bool:
-        return self.has_token(user_id)
+        if user_id is None:
+            return _DENY_MISSING_USER
+        if self.is_whitelisted(user_id):
+            return _ALLOW_WHITELIST
+        if not self._has_token_cached(user_id):
+            return _DENY_TOKEN_MISSING
+        return token_decision
+
+    def _has_token_cached(self, user_id: int) -> bool:
+        now = time.monotonic()
+        hit = self._token_cache.get(user_id)
+        if hit is not None and hit[0] > now:
+            return hit[1]
+        value = self.has_token(user_id)
+        self._cache_token_state(user_id, value, now)
+        return value
+
+    def _cache_token_state(self, user_id: int, value: bool, now: Optional[float] = None) -> None:
+        if now is None:
+            now = time.monotonic()
+        jitter = 1 + _jitter_random.uniform(-TOKEN_CACHE_JITTER, TOKEN_CACHE_JITTER)
+        with self._token_cache_lock:
+            if user_id not in self._token_cache and len(self._token_cache) >= TOKEN_CACHE_MAX_ENTRIES:
+                self._evict_expired_token_cache_locked()
+                if len(self._token_cache) >= TOKEN_CACHE_MAX_ENTRIES:
+                    # Still full of live entries: drop the oldest insertion.
+                    self._token_cache.pop(next(iter(self._token_cache)), None)
+            self._token_cache[user_id] = (now + self._cache_ttl * jitter, value)
+
+    def _evict_expired_token_cache(self) -> None:
+        with self._token_cache_lock:
+            self._evict_expired_token_cache_locked()
+
+    def _evict_expired_token_cache_locked(self) -> None:
+        now = time.monotonic()
+        expired = [user_id for user_id, (expiry, _) in self._token_cache.items() if expiry <= now]
+        for user_id in expired:
+            self._token_cache.pop(user_id, None)
 
     @staticmethod
-    def _compute_whitelist_version(ids: Set[int]) -> str:
+    def _compute_whitelist_version(ids: AbstractSet[int]) -> str:
         if not ids:
             return "empty"
         digest = hashlib.sha256(
@@ -1,20 +1,29 @@
 from __future__ import annotations
 
+import asyncio
 import contextlib
 import logging
 import os
 import tempfile
 import threading
 import time
-from collections import defaultdict, deque
-from dataclasses import dataclass
-from datetime import datetime, timedelta, timezone
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import timedelta, timezone
 from enum import Enum
 from pathlib import Path
 from typing import Dict, Optional
 
 from pydrive2.auth import GoogleAuth
 
+try:  # pragma: no cover - imported lazily for non-POSIX platforms
+    import fcntl
+
+    _FCNTL_AVAILABLE = True
+except ImportError:  # pragma: no cover - Windows fallback
+    fcntl = None  # type: ignore[assignment]
+    _FCNTL_AVAILABLE = False
+
 from creds import get_google_token_base_dir, get_user_token_path
 
 logger = logging.getLogger("auth")
@@ -24,9 +33,16 @@ DEFAULT_SCOPES = (
     "https://www.googleapis.com/auth/drive.file",
 )
 
+_OFFLINE_AUTH_PARAMS = {"access_type": "offline", "prompt": "consent"}
+
 _CACHE_TTL_SECONDS = 300
-_REFRESH_WINDOW = timedelta(hours=24)
+_CACHE_MAX_ENTRIES = 10_000
+# Cache hits newer than this skip the stat() that checks the token file for
+# out-of-band changes.
+_STAT_REVALIDATE_SECONDS = 5.0
+_REFRESH_WINDOW_SECONDS = timedelta(hours=24).total_seconds()
 _REFRESH_FAILURE_THRESHOLD = 3
+_FILE_LOCK_POLL_SECONDS = 0.01
 
 
 class TokenState(Enum):
@@ -47,17 +63,41 @@ class TokenLoadResult:
     error: Optional[str] = None
     quarantined_to: Optional[Path] = None
     latency_ms: float = 0.0
+    _metadata: Optional[Dict[str, object]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def as_metadata(self) -> Dict[str, object]:
-        return {
-            "user_id": self.user_id,
-            "path": str(self.path),
-            "state": self.state.value,
-            "refreshed": self.refreshed,
-            "error": self.error,
-            "quarantined_to": str(self.quarantined_to) if self.quarantined_to else None,
-            "latency_ms": round(self.latency_ms, 3),
-        }
+        """Return the log metadata for this result.
+
+        Results are not modified after construction and cached results are
+        served repeatedly, so the dict is built once and shared; copy it
+        before adding keys.
+        """
+
+        if self._metadata is None:
+            self._metadata = {
+                "user_id": self.user_id,
+                "path": str(self.path),
+                "state": self.state.value,
+                "refreshed": self.refreshed,
+                "error": self.error,
+                "quarantined_to": str(self.quarantined_to) if self.quarantined_to else None,
+                "latency_ms": round(self.latency_ms, 3),
+            }
+        return self._metadata
+
+
+@dataclass(slots=True)
+class _UserLock:
+    lock: threading.Lock
+    users: int = 0
+
+
+@dataclass(slots=True)
+class _AsyncUserLock:
+    lock: asyncio.Lock
+    users: int = 0
 
 
 @dataclass(slots=True)
@@ -66,6 +106,20 @@ class _TokenCacheEntry:
     mtime: float
     size: int
     timestamp: float
+    checked_at: float
+    # Epoch seconds at which a cached VALID access token lapses.
+    expiry_ts: Optional[float] = None
+
+
+def _expiry_timestamp(result: TokenLoadResult) -> Optional[float]:
+    if result.state is not TokenState.VALID or result.gauth is None:
+        return None
+    credentials = getattr(result.gauth, "credentials", None)
+    token_expiry = getattr(credentials, "token_expiry", None)
+    if token_expiry is None:
+        return None
+    # oauth2client keeps token_expiry as naive UTC.
+    return token_expiry.replace(tzinfo=timezone.utc).timestamp()
 
 
 class TokenStore:
@@ -74,12 +128,39 @@ class TokenStore:
         *,
         base_dir: Optional[Path] = None,
         cache_ttl_seconds: int = _CACHE_TTL_SECONDS,
+        max_cache_entries: int = _CACHE_MAX_ENTRIES,
     ) -> None:
         self._base_dir = (base_dir or get_google_token_base_dir()).expanduser()
         self._cache_ttl = max(1, cache_ttl_seconds)
-        self._cache: Dict[int, _TokenCacheEntry] = {}
-        self._locks: Dict[int, threading.Lock] = defaultdict(threading.Lock)
-        self._refresh_failures: Dict[int, deque[datetime]] = defaultdict(deque)
+        self._max_cache_entries = max(1, max_cache_entries)
+        # Least recently used first; hits move an entry to the end.
+        self._cache: OrderedDict[int, _TokenCacheEntry] = OrderedDict()
+        self._token_paths: Dict[int, Path] = {}
+        self._client_secrets = Path(
+            os.getenv(
+                "GOOGLE_CLIENT_SECRETS_FILE",
+                self._base_dir.parent / "client_secrets.json",
+            )
+        )
+        # Settings shared by every user's GoogleAuth; only the credential
+        # paths, scopes and auth params are filled in per call.
+        self._settings_template: Dict[str, object] = {
+            "client_config_backend": "file",
+            "client_config_file": str(self._client_secrets),
+            "save_credentials": True,
+            "save_credentials_backend": "file",
+            "get_refresh_token": True,
+        }
+        # Per-user locks live only while someone holds or waits on them, so the
+        # map is bounded by concurrent users rather than every user ever seen.
+        self._locks: Dict[int, _UserLock] = {}
+        self._locks_guard = threading.Lock()
+        # Async callers queue on these before taking a worker thread; they are
+        # only touched from the event loop, so no guard is needed.
+        self._async_locks: Dict[int, _AsyncUserLock] = {}
+        # Monotonic timestamps of each user's most recent refresh failures,
+        # kept only while the user has unresolved failures.
+        self._refresh_failures: Dict[int, deque[float]] = {}
         self._ensure_base_dir()
 
     # ------------------------------------------------------------------
@@ -100,26 +181,15 @@ class TokenStore:
         token_path = Path(token_file).expanduser()
         self.ensure_token_storage(token_path)
         settings = gauth.settings
-        client_secrets = Path(
-            os.getenv(
-                "GOOGLE_CLIENT_SECRETS_FILE",
-                self._base_dir.parent / "client_secrets.json",
-            )
-        )
-
-        settings["client_config_backend"] = "file"
-        settings["client_config_file"] = str(client_secrets)
+        settings.update(self._settings_template)
+        # Mutable values are created per call so GoogleAuth instances never
+        # share them.
         settings["oauth_scope"] = list(DEFAULT_SCOPES)
-
-        settings["save_credentials"] = True
-        settings["save_credentials_backend"] = "file"
         settings["save_credentials_file"] = str(token_path)
         settings["save_credentials_dir"] = str(token_path.parent)
-        settings["get_refresh_token"] = True
 
         auth_param = settings.get("auth_param", {}) or {}
-        auth_param["access_type"] = "offline"
-        auth_param["prompt"] = "consent"
+        auth_param.update(_OFFLINE_AUTH_PARAMS)
         settings["auth_param"] = auth_param
 
         return gauth
@@ -135,6 +205,24 @@ class TokenStore:
             return refresh_result
         return load_result
 
+    async def prepare_gauth_async(self, user_id: int) -> TokenLoadResult:
+        """Async variant of :meth:`prepare_gauth` that keeps file I/O off the event loop."""
+
+        entry = self._async_locks.get(user_id)
+        if entry is None:
+            entry = self._async_locks[user_id] = _AsyncUserLock(asyncio.Lock())
+        entry.users += 1
+        try:
+            async with entry.lock:
+                load_result = await asyncio.to_thread(self._load, user_id)
+                if load_result.state is TokenState.EXPIRED and load_result.gauth is not None:
+                    return await asyncio.to_thread(self.refresh, user_id, load_result.gauth)
+                return load_result
+        finally:
+            entry.users -= 1
+            if not entry.users:
+                del self._async_locks[user_id]
+
     def refresh(self, user_id: int, gauth: GoogleAuth) -> TokenLoadResult:
         start = time.perf_counter()
         token_path = self.get_token_path(user_id)
@@ -180,7 +268,7 @@ class TokenStore:
             refreshed=True,
             latency_ms=latency_ms,
         )
-        self._refresh_failures[user_id].clear()
+        self._refresh_failures.pop(user_id, None)
         self._update_cache(user_id, result)
         logger.info("🔁 Refreshed access token for user %s", user_id)
         return result
@@ -199,7 +287,7 @@ class TokenStore:
             refreshed=False,
             latency_ms=latency_ms,
         )
-        self._refresh_failures[user_id].clear()
+        self._refresh_failures.pop(user_id, None)
         self._update_cache(user_id, result)
         logger.info("💾 Stored credentials for user %s", user_id)
         return result
@@ -208,7 +296,17 @@ class TokenStore:
         token_path = self.get_token_path(user_id)
         if not token_path.exists():
             return None
-        return self._quarantine_file(user_id, token_path, reason)
+        destination = self._quarantine_file(user_id, token_path, reason)
+        if destination is not None:
+            self._update_cache(user_id, TokenLoadResult(
+                user_id=user_id,
+                path=token_path,
+                state=TokenState.CORRUPTED,
+                gauth=None,
+                error=reason,
+                quarantined_to=destination,
+            ), mtime=0.0, size=0)
+        return destination
 
     def clear_cache(self, user_id: Optional[int] = None) -> None:
         if user_id is None:
@@ -217,17 +315,33 @@ class TokenStore:
             self._cache.pop(user_id, None)
 
     def get_token_path(self, user_id: int) -> Path:
-        return get_user_token_path(int(user_id)).expanduser()
+        user_id = int(user_id)
+        path = self._token_paths.get(user_id)
+        if path is None:
+            path = self._token_paths[user_id] = get_user_token_path(user_id).expanduser()
+        return path
 
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
     def _load(self, user_id: int) -> TokenLoadResult:
         start = time.perf_counter()
+        entry = self._cache.get(user_id)
+        if entry is not None and entry.expiry_ts is not None and time.time() >= entry.expiry_ts:
+            # The access token lapsed after caching; reload so it is reported
+            # EXPIRED and refreshed rather than served as VALID.
+            entry = None
+        if (
+            entry
+            and start - entry.timestamp < self._cache_ttl
+            and start - entry.checked_at < _STAT_REVALIDATE_SECONDS
+        ):
+            self._touch_cache(user_id)
+            return entry.result
+
         token_path = self.get_token_path(user_id)
         self.ensure_token_storage(token_path)
 
-        entry = self._cache.get(user_id)
         token_stat = None
         try:
             token_stat = token_path.stat()
@@ -241,8 +355,12 @@ class TokenStore:
                     entry.mtime == token_stat.st_mtime
                     and entry.size == token_stat.st_size
                 ):
+                    entry.checked_at = now
+                    self._touch_cache(user_id)
                     return entry.result
         elif entry and token_stat is None and now - entry.timestamp < self._cache_ttl:
+            entry.checked_at = now
+            self._touch_cache(user_id)
             return entry.result
 
         if token_stat is None:
@@ -262,35 +380,17 @@ class TokenStore:
         try:
             gauth.LoadCredentialsFile(str(token_path))
         except Exception as exc:
-            quarantined = self._quarantine_file(user_id, token_path, "load_error")
-            latency_ms = (time.perf_counter() - start) * 1000
-            result = TokenLoadResult(
-                user_id=user_id,
-                path=token_path,
-                state=TokenState.CORRUPTED,
-                gauth=None,
-                error=str(exc),
-                quarantined_to=quarantined,
-                latency_ms=latency_ms,
+            result = self._quarantine_corrupted(
+                user_id, token_path, "load_error", str(exc), start
             )
-            self._update_cache(user_id, result, mtime=0.0, size=0)
             logger.warning("⚠️ Invalid credentials for user %s: %s", user_id, exc)
             return result
 
         credentials = getattr(gauth, "credentials", None)
         if credentials is None or getattr(credentials, "invalid", False):
-            quarantined = self._quarantine_file(user_id, token_path, "invalid_credentials")
-            latency_ms = (time.perf_counter() - start) * 1000
-            result = TokenLoadResult(
-                user_id=user_id,
-                path=token_path,
-                state=TokenState.CORRUPTED,
-                gauth=None,
-                error="invalid_credentials",
-                quarantined_to=quarantined,
-                latency_ms=latency_ms,
+            result = self._quarantine_corrupted(
+                user_id, token_path, "invalid_credentials", "invalid_credentials", start
             )
-            self._update_cache(user_id, result, mtime=0.0, size=0)
             logger.warning("⚠️ Removed invalid credentials for user %s", user_id)
             return result
 
@@ -315,30 +415,72 @@ class TokenStore:
         return result
 
     def _atomic_save(self, user_id: int, gauth: GoogleAuth, token_path: Path) -> None:
+        credentials = gauth.credentials
+        if credentials is None:
+            raise ValueError(f"No credentials to save for user {user_id}")
+        # Serialise in memory and write once; mkstemp creates the file 0o600,
+        # so the token is never readable by others and needs no chmod.
+        payload = credentials.to_json().encode("utf-8")
         self.ensure_token_storage(token_path)
         token_dir = token_path.parent
         with self._file_lock(token_dir / f"{token_path.name}.lock"):
-            with tempfile.NamedTemporaryFile(
-                "w", delete=False, dir=str(token_dir), prefix="tmp_token_", suffix=".json"
-            ) as temp_file:
-                temp_path = Path(temp_file.name)
+            fd, temp_name = tempfile.mkstemp(
+                dir=str(token_dir), prefix="tmp_token_", suffix=".json"
+            )
+            temp_path = Path(temp_name)
             try:
-                gauth.SaveCredentialsFile(str(temp_path))
+                with os.fdopen(fd, "wb") as temp_file:
+                    temp_file.write(payload)
                 os.replace(temp_path, token_path)
-                self._chmod(token_path, 0o600)
             except Exception:
                 with contextlib.suppress(FileNotFoundError):
                     temp_path.unlink()
                 raise
 
+    def _quarantine_corrupted(
+        self, user_id: int, token_path: Path, reason: str, error: str, start: float
+    ) -> TokenLoadResult:
+        """Quarantine a token that failed to load, once per corruption.
+
+        Concurrent loads of the same bad file serialise on the user lock; the
+        losers find the token already moved aside and reuse the winner's
+        cached result instead of quarantining (or deleting) it again.
+        """
+
+        with self._user_lock(user_id):
+            entry = self._cache.get(user_id)
+            if (
+                entry
+                and entry.result.state is TokenState.CORRUPTED
+                and entry.result.quarantined_to is not None
+                and not token_path.exists()
+            ):
+                return entry.result
+
+            quarantined = self._quarantine_file(user_id, token_path, reason)
+            latency_ms = (time.perf_counter() - start) * 1000
+            result = TokenLoadResult(
+                user_id=user_id,
+                path=token_path,
+                state=TokenState.CORRUPTED,
+                gauth=None,
+                error=error,
+                quarantined_to=quarantined,
+                latency_ms=latency_ms,
+            )
+            self._update_cache(user_id, result, mtime=0.0, size=0)
+        return result
+
     def _quarantine_file(
         self, user_id: int, token_path: Path, reason: str
     ) -> Optional[Path]:
+        """Move the token aside; the caller records the outcome in the cache."""
+
         try:
             quarantine_dir = self._base_dir / "quarantine"
             quarantine_dir.mkdir(parents=True, exist_ok=True)
             self._chmod(quarantine_dir, 0o700)
-            timestamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+            timestamp = time.strftime("%Y%m%d%H%M%S", time.gmtime())
             destination = quarantine_dir / f"{token_path.stem}_{timestamp}.json"
             if token_path.exists():
                 token_path.replace(destination)
@@ -348,14 +490,6 @@ class TokenStore:
                     reason,
                     destination,
                 )
-                self._update_cache(user_id, TokenLoadResult(
-                    user_id=user_id,
-                    path=token_path,
-                    state=TokenState.CORRUPTED,
-                    gauth=None,
-                    error=reason,
-                    quarantined_to=destination,
-                ), mtime=0.0, size=0)
                 return destination
         except Exception as exc:  # pragma: no cover - defensive logging
             logger.error(
@@ -372,15 +506,21 @@ class TokenStore:
         exc: Exception,
         start: float,
     ) -> TokenLoadResult:
-        now = datetime.now(timezone.utc)
-        failures = self._refresh_failures[user_id]
-        cutoff = now - _REFRESH_WINDOW
-        while failures and failures[0] < cutoff:
-            failures.popleft()
+        now = time.monotonic()
+        failures = self._refresh_failures.get(user_id)
+        if failures is None:
+            failures = self._refresh_failures[user_id] = deque(
+                maxlen=_REFRESH_FAILURE_THRESHOLD
+            )
         failures.append(now)
 
+        # Only the latest THRESHOLD failures are kept; the threshold is hit
+        # when the oldest of them still falls inside the window.
         quarantined: Optional[Path] = None
-        if len(failures) >= _REFRESH_FAILURE_THRESHOLD:
+        if (
+            len(failures) == _REFRESH_FAILURE_THRESHOLD
+            and now - failures[0] <= _REFRESH_WINDOW_SECONDS
+        ):
             quarantined = self._quarantine_file(user_id, token_path, "refresh_failures")
 
         latency_ms = (time.perf_counter() - start) * 1000
@@ -410,8 +550,22 @@ class TokenStore:
             mtime=mtime or 0.0,
             size=size or 0,
             timestamp=timestamp,
+            checked_at=timestamp,
+            expiry_ts=_expiry_timestamp(result),
         )
         self._cache[user_id] = entry
+        self._touch_cache(user_id)
+        while len(self._cache) > self._max_cache_entries:
+            try:
+                evicted, _ = self._cache.popitem(last=False)
+            except KeyError:  # pragma: no cover - emptied concurrently
+                break
+            self._token_paths.pop(evicted, None)
+
+    def _touch_cache(self, user_id: int) -> None:
+        # A concurrent eviction may already have dropped the entry.
+        with contextlib.suppress(KeyError):
+            self._cache.move_to_end(user_id)
 
     def _chmod(self, path: Path, mode: int) -> None:
         try:
@@ -430,6 +584,35 @@ class TokenStore:
 
     @contextlib.contextmanager
     def _file_lock(self, lock_path: Path, timeout: float = 5.0):
+        if not _FCNTL_AVAILABLE:
+            with self._exclusive_create_lock(lock_path, timeout):
+                yield
+            return
+
+        # The lock file is left in place: unlinking it would let a later
+        # caller lock a fresh inode while a waiter still holds the old one.
+        # flock is released by the kernel if the process dies, so a crash
+        # cannot leave a stale lock behind.
+        fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"Timed out waiting for lock {lock_path}")
+                    time.sleep(_FILE_LOCK_POLL_SECONDS)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    @contextlib.contextmanager
+    def _exclusive_create_lock(self, lock_path: Path, timeout: float):
         start = time.perf_counter()
         while True:
             try:
@@ -448,14 +631,23 @@ class TokenStore:
 
     @contextlib.contextmanager
     def _user_lock(self, user_id: int):
-        lock = self._locks[user_id]
-        acquired = lock.acquire(timeout=5.0)
-        if not acquired:
-            raise TimeoutError(f"Unable to acquire lock for user {user_id}")
+        with self._locks_guard:
+            entry = self._locks.get(user_id)
+            if entry is None:
+                entry = self._locks[user_id] = _UserLock(threading.Lock())
+            entry.users += 1
         try:
-            yield
+            if not entry.lock.acquire(timeout=5.0):
+                raise TimeoutError(f"Unable to acquire lock for user {user_id}")
+            try:
+                yield
+            finally:
+                entry.lock.release()
         finally:
-            lock.release()
+            with self._locks_guard:
+                entry.users -= 1
+                if not entry.users:
+                    del self._locks[user_id]
 
 
 _token_store = TokenStore()
@@ -473,6 +665,10 @@ def prepare_gauth(user_id: int) -> TokenLoadResult:
     return _token_store.prepare_gauth(user_id)
 
 
+async def prepare_gauth_async(user_id: int) -> TokenLoadResult:
+    return await _token_store.prepare_gauth_async(user_id)
+
+
 def store_gauth(user_id: int, gauth: GoogleAuth) -> TokenLoadResult:
     return _token_store.store(user_id, gauth)
 
@@ -497,6 +693,7 @@ __all__ = [
     "configure_gauth",
     "ensure_token_storage",
     "prepare_gauth",
+    "prepare_gauth_async",
     "refresh_gauth",
     "store_gauth",
     "get_token_path",
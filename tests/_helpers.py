@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+
+class DummyMessage:
+    def __init__(self) -> None:
+        self.sent: List[str] = []
+
+    async def reply_text(self, text: str) -> None:
+        self.sent.append(text)
+
+
+class DummyBot:
+    def __init__(self) -> None:
+        self.sent_messages: List[Tuple[int, str]] = []
+
+    async def send_message(self, chat_id: int, text: str, **_: object) -> None:
+        self.sent_messages.append((chat_id, text))
+
+
+def read_jsonl(path: Path) -> List[Dict[str, Any]]:
+    """Parse every non-blank line of a JSONL log file in one read."""
+
+    return [
+        json.loads(line)
+        for line in path.read_text(encoding="utf-8").splitlines()
+        if line.strip()
+    ]
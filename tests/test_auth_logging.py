@@ -18,16 +18,18 @@ class AuthLoggingTests(unittest.IsolatedAsyncioTestCase):
         self.addCleanup(self.tmpdir.cleanup)
 
         self.log_dir = self.tmpdir.name
-        os.environ["LOG_DIRECTORY"] = self.log_dir
-        os.environ["USER_STORE_PATH"] = os.path.join(self.log_dir, "users.json")
-        os.environ["GOOGLE_CLIENT_ID"] = "dummy-client"
-        os.environ["GOOGLE_CLIENT_SECRET"] = "dummy-secret"
-        os.environ["TELEGRAM_BOT_TOKEN"] = "dummy-token"
-        self.addCleanup(lambda: os.environ.pop("LOG_DIRECTORY", None))
-        self.addCleanup(lambda: os.environ.pop("USER_STORE_PATH", None))
-        self.addCleanup(lambda: os.environ.pop("GOOGLE_CLIENT_ID", None))
-        self.addCleanup(lambda: os.environ.pop("GOOGLE_CLIENT_SECRET", None))
-        self.addCleanup(lambda: os.environ.pop("TELEGRAM_BOT_TOKEN", None))
+        env_patcher = patch.dict(
+            os.environ,
+            {
+                "LOG_DIRECTORY": self.log_dir,
+                "USER_STORE_PATH": os.path.join(self.log_dir, "users.json"),
+                "GOOGLE_CLIENT_ID": "dummy-client",
+                "GOOGLE_CLIENT_SECRET": "dummy-secret",
+                "TELEGRAM_BOT_TOKEN": "dummy-token",
+            },
+        )
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
 
         for module_name in [
             "permissions",
@@ -65,7 +67,7 @@ class AuthLoggingTests(unittest.IsolatedAsyncioTestCase):
         )
 
         with patch.object(
-            self.upload_handler, "prepare_user_gauth", return_value=corrupt_result
+            self.upload_handler, "prepare_user_gauth_async", return_value=corrupt_result
         ), patch.object(
             self.upload_handler, "log_activity"
         ) as mock_log_activity:
@@ -114,7 +116,7 @@ class AuthLoggingTests(unittest.IsolatedAsyncioTestCase):
         )
 
         with patch.object(
-            self.file_handler, "prepare_user_gauth", return_value=missing_result
+            self.file_handler, "prepare_user_gauth_async", return_value=missing_result
         ), patch.object(
             self.file_handler, "log_activity"
         ) as mock_log_activity:
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import importlib
 import os
 import unittest
 from datetime import timedelta
@@ -18,44 +17,40 @@ class DummyReport:
         return "summary"
 
 
-class BotStartupAlertThresholdTests(unittest.TestCase):
-    def setUp(self) -> None:
-        importlib.reload(bot)
-
-    def test_default_threshold_is_ten(self) -> None:
-        report = DummyReport(deleted_count=9)
-        mock_app = MagicMock()
+# bot.main only reads these reports, so one instance per scenario is shared.
+REPORT_BELOW_DEFAULT_THRESHOLD = DummyReport(deleted_count=9)
+REPORT_AT_CUSTOM_THRESHOLD = DummyReport(deleted_count=3)
 
-        with patch("bot.require_bot_credentials"), patch(
-            "bot.run_cleanup", return_value=report
-        ), patch("bot.build_application", return_value=mock_app), patch(
-            "bot.log_system_info"
-        ), patch(
-            "bot.trigger_admin_alert"
-        ) as mock_alert:
-            with patch.dict(os.environ, {}, clear=False):
-                os.environ.pop("TOKEN_CLEANUP_ALERT_THRESHOLD", None)
-                bot.main()
 
-        mock_alert.assert_not_called()
-        mock_app.run_polling.assert_called_once()
+class BotStartupAlertThresholdTests(unittest.TestCase):
+    def _run_main(self, report: DummyReport, threshold: str | None = None) -> tuple[MagicMock, MagicMock]:
+        """Run ``bot.main`` with its collaborators stubbed; return the alert and app mocks."""
 
-    def test_threshold_can_be_overridden_by_environment(self) -> None:
-        report = DummyReport(deleted_count=3)
         mock_app = MagicMock()
-
         with patch("bot.require_bot_credentials"), patch(
             "bot.run_cleanup", return_value=report
         ), patch("bot.build_application", return_value=mock_app), patch(
             "bot.log_system_info"
         ), patch(
             "bot.trigger_admin_alert"
-        ) as mock_alert:
-            with patch.dict(os.environ, {"TOKEN_CLEANUP_ALERT_THRESHOLD": "3"}, clear=False):
-                bot.main()
-
-        mock_alert.assert_called_once()
-        mock_app.run_polling.assert_called_once()
+        ) as mock_alert, patch.dict(os.environ, {}, clear=False):
+            os.environ.pop("TOKEN_CLEANUP_ALERT_THRESHOLD", None)
+            if threshold is not None:
+                os.environ["TOKEN_CLEANUP_ALERT_THRESHOLD"] = threshold
+            bot.main()
+        return mock_alert, mock_app
+
+    def test_alert_threshold_defaults_to_ten_and_follows_environment(self) -> None:
+        cases = [
+            (REPORT_BELOW_DEFAULT_THRESHOLD, None, False),
+            (REPORT_AT_CUSTOM_THRESHOLD, "3", True),
+        ]
+        for report, threshold, expect_alert in cases:
+            with self.subTest(threshold=threshold, deleted=report.deleted_count):
+                mock_alert, mock_app = self._run_main(report, threshold=threshold)
+
+                self.assertEqual(mock_alert.called, expect_alert)
+                mock_app.run_polling.assert_called_once()
 
     def test_build_application_schedules_token_maintenance(self) -> None:
         builder = MagicMock()
@@ -11,24 +11,9 @@ from contextlib import redirect_stdout
 from datetime import datetime, timezone
 from pathlib import Path
 from types import SimpleNamespace
-from typing import List, Tuple
 from unittest.mock import patch
 
-
-class DummyMessage:
-    def __init__(self) -> None:
-        self.sent: List[str] = []
-
-    async def reply_text(self, text: str) -> None:
-        self.sent.append(text)
-
-
-class DummyBot:
-    def __init__(self) -> None:
-        self.sent_messages: List[Tuple[int, str]] = []
-
-    async def send_message(self, chat_id: int, text: str, **_: object) -> None:
-        self.sent_messages.append((chat_id, text))
+from tests._helpers import DummyBot, DummyMessage
 
 
 class CleanupCommandTests(unittest.IsolatedAsyncioTestCase):
@@ -36,21 +21,20 @@ class CleanupCommandTests(unittest.IsolatedAsyncioTestCase):
         self.tmpdir = tempfile.TemporaryDirectory()
         self.addCleanup(self.tmpdir.cleanup)
 
-        os.environ["LOG_DIRECTORY"] = self.tmpdir.name
-        os.environ["USER_STORE_PATH"] = os.path.join(self.tmpdir.name, "users.json")
-        os.environ["SUPER_ADMIN_IDS"] = "999"
-        os.environ["TELEGRAM_BOT_TOKEN"] = "dummy-token"
-        os.environ["GOOGLE_CLIENT_ID"] = "dummy-client"
-        os.environ["GOOGLE_CLIENT_SECRET"] = "dummy-secret"
-        os.environ["GOOGLE_TOKEN_DIR"] = self.tmpdir.name
-
-        self.addCleanup(lambda: os.environ.pop("LOG_DIRECTORY", None))
-        self.addCleanup(lambda: os.environ.pop("USER_STORE_PATH", None))
-        self.addCleanup(lambda: os.environ.pop("SUPER_ADMIN_IDS", None))
-        self.addCleanup(lambda: os.environ.pop("TELEGRAM_BOT_TOKEN", None))
-        self.addCleanup(lambda: os.environ.pop("GOOGLE_CLIENT_ID", None))
-        self.addCleanup(lambda: os.environ.pop("GOOGLE_CLIENT_SECRET", None))
-        self.addCleanup(lambda: os.environ.pop("GOOGLE_TOKEN_DIR", None))
+        env_patcher = patch.dict(
+            os.environ,
+            {
+                "LOG_DIRECTORY": self.tmpdir.name,
+                "USER_STORE_PATH": os.path.join(self.tmpdir.name, "users.json"),
+                "SUPER_ADMIN_IDS": "999",
+                "TELEGRAM_BOT_TOKEN": "dummy-token",
+                "GOOGLE_CLIENT_ID": "dummy-client",
+                "GOOGLE_CLIENT_SECRET": "dummy-secret",
+                "GOOGLE_TOKEN_DIR": self.tmpdir.name,
+            },
+        )
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
 
         for module_name in [
             "monitoring",
@@ -132,19 +116,19 @@ class CleanupScriptTests(unittest.TestCase):
         self.tmpdir = tempfile.TemporaryDirectory()
         self.addCleanup(self.tmpdir.cleanup)
 
-        os.environ["LOG_DIRECTORY"] = self.tmpdir.name
-        os.environ["USER_STORE_PATH"] = os.path.join(self.tmpdir.name, "users.json")
-        os.environ["TELEGRAM_BOT_TOKEN"] = "dummy-token"
-        os.environ["GOOGLE_CLIENT_ID"] = "dummy-client"
-        os.environ["GOOGLE_CLIENT_SECRET"] = "dummy-secret"
-        os.environ["GOOGLE_TOKEN_DIR"] = self.tmpdir.name
-
-        self.addCleanup(lambda: os.environ.pop("LOG_DIRECTORY", None))
-        self.addCleanup(lambda: os.environ.pop("USER_STORE_PATH", None))
-        self.addCleanup(lambda: os.environ.pop("TELEGRAM_BOT_TOKEN", None))
-        self.addCleanup(lambda: os.environ.pop("GOOGLE_CLIENT_ID", None))
-        self.addCleanup(lambda: os.environ.pop("GOOGLE_CLIENT_SECRET", None))
-        self.addCleanup(lambda: os.environ.pop("GOOGLE_TOKEN_DIR", None))
+        env_patcher = patch.dict(
+            os.environ,
+            {
+                "LOG_DIRECTORY": self.tmpdir.name,
+                "USER_STORE_PATH": os.path.join(self.tmpdir.name, "users.json"),
+                "TELEGRAM_BOT_TOKEN": "dummy-token",
+                "GOOGLE_CLIENT_ID": "dummy-client",
+                "GOOGLE_CLIENT_SECRET": "dummy-secret",
+                "GOOGLE_TOKEN_DIR": self.tmpdir.name,
+            },
+        )
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
 
         for module_name in [
             "monitoring",
@@ -211,25 +195,11 @@ class CleanupScriptMinimalEnvTests(unittest.TestCase):
         self.tmpdir = tempfile.TemporaryDirectory()
         self.addCleanup(self.tmpdir.cleanup)
 
-        self._saved_env = {}
-        for name in [
-            "TELEGRAM_BOT_TOKEN",
-            "GOOGLE_CLIENT_ID",
-            "GOOGLE_CLIENT_SECRET",
-            "GOOGLE_TOKEN_DIR",
-        ]:
-            self._saved_env[name] = os.environ.pop(name, None)
-
-        os.environ["GOOGLE_TOKEN_DIR"] = self.tmpdir.name
-
-        def restore_env() -> None:
-            for key, value in self._saved_env.items():
-                if value is None:
-                    os.environ.pop(key, None)
-                else:
-                    os.environ[key] = value
-
-        self.addCleanup(restore_env)
+        env_patcher = patch.dict(os.environ, {"GOOGLE_TOKEN_DIR": self.tmpdir.name})
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
+        for name in ["TELEGRAM_BOT_TOKEN", "GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET"]:
+            os.environ.pop(name, None)
         self.addCleanup(lambda: shutil.rmtree("logs", ignore_errors=True))
 
         for module_name in ["creds", "puzzling.token_cleanup", "cleanup_tokens"]:
@@ -7,17 +7,27 @@ import tempfile
 import unittest
 from datetime import date, timedelta
 from pathlib import Path
+from unittest.mock import patch
+
+from tests._helpers import read_jsonl
 
 
 class StructuredLoggingTests(unittest.TestCase):
     def setUp(self) -> None:
         self.tmpdir = tempfile.TemporaryDirectory()
         self.addCleanup(self.tmpdir.cleanup)
-
-        os.environ["LOG_DIRECTORY"] = self.tmpdir.name
-        os.environ["LOG_RETENTION_DAYS"] = "2"
-        self.addCleanup(lambda: os.environ.pop("LOG_DIRECTORY", None))
-        self.addCleanup(lambda: os.environ.pop("LOG_RETENTION_DAYS", None))
+        self.log_dir = Path(self.tmpdir.name)
+        self.today_log = self.log_dir / f"{date.today().isoformat()}.jsonl"
+
+        env_patcher = patch.dict(
+            os.environ,
+            {
+                "LOG_DIRECTORY": self.tmpdir.name,
+                "LOG_RETENTION_DAYS": "2",
+            },
+        )
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
 
         if "monitoring" in sys.modules:
             del sys.modules["monitoring"]
@@ -44,11 +54,10 @@ class StructuredLoggingTests(unittest.TestCase):
             metadata={"foo": "bar"},
         )
 
-        log_path = Path(self.tmpdir.name) / f"{date.today().isoformat()}.jsonl"
-        self.assertTrue(log_path.exists())
-        lines = log_path.read_text(encoding="utf-8").strip().splitlines()
-        self.assertEqual(len(lines), 1)
-        entry = json.loads(lines[0])
+        self.assertTrue(self.today_log.exists())
+        entries = read_jsonl(self.today_log)
+        self.assertEqual(len(entries), 1)
+        entry = entries[0]
 
         self.assertEqual(entry["category"], "activity")
         self.assertEqual(entry["user"], {"id": 42, "role": "user"})
@@ -65,7 +74,7 @@ class StructuredLoggingTests(unittest.TestCase):
 
     def test_cleanup_removes_expired_files(self) -> None:
         old_date = date.today() - timedelta(days=5)
-        old_path = Path(self.tmpdir.name) / f"{old_date.isoformat()}.jsonl"
+        old_path = self.log_dir / f"{old_date.isoformat()}.jsonl"
         old_path.write_text("{\n}", encoding="utf-8")
 
         # reset cleanup flag so the next write triggers removal
@@ -73,8 +82,7 @@ class StructuredLoggingTests(unittest.TestCase):
         self.monitoring.log_system_info("hello")
 
         self.assertFalse(old_path.exists())
-        today_path = Path(self.tmpdir.name) / f"{date.today().isoformat()}.jsonl"
-        entries = [json.loads(line) for line in today_path.read_text(encoding="utf-8").splitlines()]
+        entries = read_jsonl(self.today_log)
         self.assertTrue(any(entry["category"] == "system" for entry in entries))
 
     def test_system_error_logs_exception_details(self) -> None:
@@ -82,11 +90,10 @@ class StructuredLoggingTests(unittest.TestCase):
 
         self.monitoring.log_system_error("failed", exc=error)
 
-        log_path = Path(self.tmpdir.name) / f"{date.today().isoformat()}.jsonl"
-        contents = log_path.read_text(encoding="utf-8").strip().splitlines()
-        self.assertGreaterEqual(len(contents), 1)
+        entries = read_jsonl(self.today_log)
+        self.assertGreaterEqual(len(entries), 1)
 
-        entry = json.loads(contents[-1])
+        entry = entries[-1]
         self.assertEqual(entry["category"], "system")
         self.assertEqual(entry["level"], "ERROR")
         self.assertEqual(entry["message"], "failed")
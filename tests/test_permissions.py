@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import json
 import logging
 import os
 import sys
@@ -10,22 +9,9 @@ from datetime import date
 from pathlib import Path
 from types import SimpleNamespace
 from typing import List
+from unittest.mock import patch
 
-
-class DummyMessage:
-    def __init__(self) -> None:
-        self.sent: List[str] = []
-
-    async def reply_text(self, text: str) -> None:
-        self.sent.append(text)
-
-
-class DummyBot:
-    def __init__(self) -> None:
-        self.sent_messages: List[tuple[int, str]] = []
-
-    async def send_message(self, chat_id: int, text: str) -> None:
-        self.sent_messages.append((chat_id, text))
+from tests._helpers import DummyBot, DummyMessage, read_jsonl
 
 
 class RequireRoleLoggingTests(unittest.IsolatedAsyncioTestCase):
@@ -36,10 +22,15 @@ class RequireRoleLoggingTests(unittest.IsolatedAsyncioTestCase):
         self.log_dir = Path(self.tmpdir.name)
         self.log_path = self.log_dir / f"{date.today().isoformat()}.jsonl"
 
-        os.environ["LOG_DIRECTORY"] = self.tmpdir.name
-        os.environ["USER_STORE_PATH"] = str(self.log_dir / "users.json")
-        self.addCleanup(lambda: os.environ.pop("LOG_DIRECTORY", None))
-        self.addCleanup(lambda: os.environ.pop("USER_STORE_PATH", None))
+        env_patcher = patch.dict(
+            os.environ,
+            {
+                "LOG_DIRECTORY": self.tmpdir.name,
+                "USER_STORE_PATH": str(self.log_dir / "users.json"),
+            },
+        )
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
 
         for module_name in ["permissions", "monitoring"]:
             if module_name in sys.modules:
@@ -81,11 +72,7 @@ class RequireRoleLoggingTests(unittest.IsolatedAsyncioTestCase):
             handler.flush()
 
         self.assertTrue(self.log_path.exists())
-        entries = [
-            json.loads(line)
-            for line in self.log_path.read_text(encoding="utf-8").splitlines()
-            if line.strip()
-        ]
+        entries = read_jsonl(self.log_path)
         activity_entries = [entry for entry in entries if entry.get("category") == "activity"]
         self.assertTrue(activity_entries)
         last_entry = activity_entries[-1]
@@ -120,11 +107,7 @@ class RequireRoleLoggingTests(unittest.IsolatedAsyncioTestCase):
             handler.flush()
 
         self.assertTrue(self.log_path.exists())
-        entries = [
-            json.loads(line)
-            for line in self.log_path.read_text(encoding="utf-8").splitlines()
-            if line.strip()
-        ]
+        entries = read_jsonl(self.log_path)
         activity_entries = [entry for entry in entries if entry.get("category") == "activity"]
         self.assertTrue(activity_entries)
         last_entry = activity_entries[-1]
@@ -15,8 +15,9 @@ class SecurityAuditLoggingTests(unittest.IsolatedAsyncioTestCase):
         self.tmpdir = tempfile.TemporaryDirectory()
         self.addCleanup(self.tmpdir.cleanup)
 
-        os.environ["LOG_DIRECTORY"] = self.tmpdir.name
-        self.addCleanup(lambda: os.environ.pop("LOG_DIRECTORY", None))
+        env_patcher = patch.dict(os.environ, {"LOG_DIRECTORY": self.tmpdir.name})
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
 
         for module_name in ["monitoring", "security.interceptor"]:
             if module_name in sys.modules:
@@ -51,13 +52,23 @@ class SecurityAuditLoggingTests(unittest.IsolatedAsyncioTestCase):
             def evaluate_access(user_id, level):
                 return allow_decision
 
+            @staticmethod
+            def evaluator_for(level):
+                return lambda user_id: allow_decision
+
+        manager = AllowManager()
+
         async def handler(update, context, *args, **kwargs):
+            # A whitelist reload while the handler runs must not relabel the
+            # decision that was already made.
+            manager.policy_version = "policy-v2"
+            manager.whitelist_version = "wl-v6"
             return "ok"
 
         wrapped = self.interceptor.secure(
             "test_command",
             self.interceptor.SecurityLevel.AUTHORIZED,
-            manager=AllowManager(),
+            manager=manager,
         )(handler)
 
         update = SimpleNamespace(
@@ -106,6 +117,10 @@ class SecurityAuditLoggingTests(unittest.IsolatedAsyncioTestCase):
             def evaluate_access(user_id, level):
                 return deny_decision
 
+            @staticmethod
+            def evaluator_for(level):
+                return lambda user_id: deny_decision
+
         async def handler(update, context, *args, **kwargs):  # pragma: no cover
             return "should not run"
 
@@ -147,6 +162,44 @@ class SecurityAuditLoggingTests(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(payload["whitelist_version"], "wl-v5")
         self.assertTrue(payload["ts"].startswith(str(date.today())))
 
+    async def test_disabled_audit_skips_timing_and_entries(self) -> None:
+        allow_decision = self.interceptor.AccessDecision(
+            True, self.interceptor.AccessDecision.ALLOW, via="token"
+        )
+
+        class AllowManager:
+            policy_version = "policy-v1"
+            whitelist_version = "wl-v5"
+
+            @staticmethod
+            def evaluator_for(level):
+                return lambda user_id: allow_decision
+
+        async def handler(update, context, *args, **kwargs):
+            return "ok"
+
+        wrapped = self.interceptor.secure(
+            "test_command",
+            self.interceptor.SecurityLevel.AUTHORIZED,
+            manager=AllowManager(),
+        )(handler)
+
+        update = SimpleNamespace(
+            effective_user=SimpleNamespace(id=42),
+            effective_chat=SimpleNamespace(id=99, type="private"),
+            effective_message=SimpleNamespace(reply_text=AsyncMock()),
+        )
+        context = SimpleNamespace(bot=SimpleNamespace(send_message=AsyncMock()))
+
+        with patch.object(self.interceptor, "SECURITY_AUDIT_ENABLED", False), patch(
+            "security.interceptor.log_security_audit"
+        ) as audit, patch("security.interceptor.time.perf_counter") as perf_counter:
+            result = await wrapped(update, context)
+
+        self.assertEqual(result, "ok")
+        audit.assert_not_called()
+        perf_counter.assert_not_called()
+
 
 if __name__ == "__main__":
     unittest.main()
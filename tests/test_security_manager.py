@@ -2,13 +2,18 @@ from __future__ import annotations
 
 import os
 import tempfile
+import threading
+import time
 import unittest
 from pathlib import Path
 from types import SimpleNamespace
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import security.interceptor as security_interceptor
+import security.manager as security_manager
 from security.interceptor import DENIAL_MESSAGES, secure
 from security.manager import AccessDecision, PermissionManager, SecurityLevel
+from tests._helpers import DummyMessage
 
 
 EXPECTED_DENIAL_MESSAGES = {
@@ -35,13 +40,22 @@ class PermissionManagerAdminTests(unittest.TestCase):
         self.env_path = Path(self.tmpdir.name) / ".env"
         self.env_path.write_text("USER_WHITELIST=100\n", encoding="utf-8")
 
-        os.environ["GOOGLE_TOKEN_DIR"] = self.tmpdir.name
-        self.addCleanup(lambda: os.environ.pop("GOOGLE_TOKEN_DIR", None))
+        env_patcher = patch.dict(os.environ, {"GOOGLE_TOKEN_DIR": self.tmpdir.name})
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
 
         self.manager = PermissionManager(env_path=self.env_path, cache_ttl_seconds=1)
 
     def test_denial_messages_are_frozen(self) -> None:
-        self.assertDictEqual(DENIAL_MESSAGES, EXPECTED_DENIAL_MESSAGES)
+        self.assertEqual(dict(DENIAL_MESSAGES), EXPECTED_DENIAL_MESSAGES)
+        with self.assertRaises(TypeError):
+            DENIAL_MESSAGES[AccessDecision.RATE_LIMITED] = "changed"  # type: ignore[index]
+
+    def test_parse_id_list_keeps_only_numeric_fields(self) -> None:
+        raw = " 100, 200 ,abc,12a3,-5,, 300\t,4 5,"
+
+        self.assertEqual(PermissionManager._parse_id_list(raw), {100, 200, 300})
+        self.assertEqual(PermissionManager._parse_id_list(""), set())
 
     def test_missing_user_denied(self) -> None:
         decision = self.manager.evaluate_access(None, SecurityLevel.AUTHORIZED)
@@ -58,6 +72,28 @@ class PermissionManagerAdminTests(unittest.TestCase):
         self.assertEqual(decision.reason, AccessDecision.DENY_UNAUTHORIZED_ADMIN_REQUIRED)
         self.assertEqual(DENIAL_MESSAGES[decision.reason], EXPECTED_DENIAL_MESSAGES[decision.reason])
 
+    def test_admin_set_is_reused_until_roles_change(self) -> None:
+        with patch("security.manager.has_permission", return_value=True) as has_permission:
+            first = self.manager.evaluate_access(100, SecurityLevel.ADMIN)
+            second = self.manager.evaluate_access(100, SecurityLevel.ADMIN)
+
+        self.assertTrue(first.allowed)
+        self.assertTrue(second.allowed)
+        has_permission.assert_called_once_with(100, "admin")
+
+        with patch("security.manager.has_permission", return_value=False), patch(
+            "security.manager.roles_version", return_value=-1
+        ):
+            demoted = self.manager.evaluate_access(100, SecurityLevel.ADMIN)
+
+        self.assertEqual(demoted.reason, AccessDecision.DENY_UNAUTHORIZED_ADMIN_REQUIRED)
+
+        with patch("security.manager.has_permission", return_value=True):
+            self.manager.invalidate_admin_cache()
+            promoted = self.manager.evaluate_access(100, SecurityLevel.ADMIN)
+
+        self.assertTrue(promoted.allowed)
+
     def test_non_whitelisted_admin_denied_even_with_token(self) -> None:
         user_id = 200
         token_path = self.manager._token_base_dir / f"token_{user_id}.json"  # type: ignore[attr-defined]
@@ -81,6 +117,109 @@ class PermissionManagerAdminTests(unittest.TestCase):
         self.assertEqual(decision.reason, AccessDecision.DENY_UNAUTHORIZED_TOKEN_MISSING)
         self.assertEqual(DENIAL_MESSAGES[decision.reason], EXPECTED_DENIAL_MESSAGES[decision.reason])
 
+    def test_register_token_invalidates_cached_miss(self) -> None:
+        user_id = 350
+
+        first = self.manager.evaluate_access(user_id, SecurityLevel.AUTHORIZED)
+        self.assertEqual(first.reason, AccessDecision.DENY_UNAUTHORIZED_TOKEN_MISSING)
+
+        token_path = self.manager._token_base_dir / f"token_{user_id}.json"  # type: ignore[attr-defined]
+        token_path.write_text("{}", encoding="utf-8")
+        self.manager.register_token(user_id)
+
+        second = self.manager.evaluate_access(user_id, SecurityLevel.AUTHORIZED)
+        self.assertTrue(second.allowed)
+        self.assertEqual(second.via, "token")
+
+    def test_registered_token_skips_filesystem_check(self) -> None:
+        self.manager.register_token(355)
+
+        with patch.object(Path, "exists", side_effect=AssertionError("exists called")):
+            decision = self.manager.evaluate_access(355, SecurityLevel.AUTHORIZED)
+
+        self.assertTrue(decision.allowed)
+        self.assertEqual(decision.via, "token")
+
+    def test_token_snapshot_answers_misses_without_rescanning(self) -> None:
+        with patch("security.manager.os.scandir", wraps=os.scandir) as scandir:
+            self.assertFalse(self.manager.has_token(360))
+            self.assertFalse(self.manager.has_token(361))
+
+        scandir.assert_not_called()
+
+    def test_deleted_token_is_rejected_before_snapshot_refresh(self) -> None:
+        user_id = 370
+        token_path = self.manager._token_base_dir / f"token_{user_id}.json"  # type: ignore[attr-defined]
+        token_path.write_text("{}", encoding="utf-8")
+        self.manager.register_token(user_id)
+        self.assertTrue(self.manager.has_token(user_id))
+
+        token_path.unlink()
+
+        self.assertIn(user_id, self.manager._token_ids)  # type: ignore[attr-defined]
+        self.assertFalse(self.manager.has_token(user_id))
+
+    def test_concurrent_stale_lookups_scan_token_dir_once(self) -> None:
+        token_path = self.manager._token_base_dir / "token_380.json"  # type: ignore[attr-defined]
+        token_path.write_text("{}", encoding="utf-8")
+        self.manager._token_ids_snapshot_ts = 0.0  # type: ignore[attr-defined]
+        real_scandir = os.scandir
+
+        def slow_scandir(path):
+            time.sleep(0.05)
+            return real_scandir(path)
+
+        barrier = threading.Barrier(8)
+        results: list[bool] = []
+
+        def lookup() -> None:
+            barrier.wait()
+            results.append(self.manager.has_token(380))
+
+        with patch("security.manager.os.scandir", side_effect=slow_scandir) as scandir:
+            threads = [threading.Thread(target=lookup) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(scandir.call_count, 1)
+        self.assertEqual(results, [True] * 8)
+
+    def test_token_cache_expiry_is_jittered_within_bounds(self) -> None:
+        ttl = self.manager._cache_ttl  # type: ignore[attr-defined]
+        for offset in (-0.2, 0.0, 0.2):
+            with self.subTest(offset=offset):
+                self.manager._token_cache.clear()  # type: ignore[attr-defined]
+                with patch("security.manager.time.monotonic", return_value=0.0), patch.object(
+                    security_manager._jitter_random, "uniform", return_value=offset
+                ) as uniform:
+                    self.manager._has_token_cached(600)  # type: ignore[attr-defined]
+
+                uniform.assert_called_once_with(-0.2, 0.2)
+                expiry, _ = self.manager._token_cache[600]  # type: ignore[attr-defined]
+                self.assertAlmostEqual(expiry, ttl * (1 + offset))
+                self.assertGreaterEqual(expiry, 0.8 * ttl)
+                self.assertLessEqual(expiry, 1.2 * ttl)
+
+    def test_token_cache_is_bounded_and_evicts_expired_entries(self) -> None:
+        with patch("security.manager.TOKEN_CACHE_MAX_ENTRIES", 3), patch(
+            "security.manager.time.monotonic", return_value=1000.0
+        ):
+            for user_id in (501, 502, 503):
+                self.manager._has_token_cached(user_id)  # type: ignore[attr-defined]
+            self.manager._has_token_cached(504)  # type: ignore[attr-defined]
+
+        cache = self.manager._token_cache  # type: ignore[attr-defined]
+        self.assertEqual(list(cache), [502, 503, 504])
+
+        with patch("security.manager.TOKEN_CACHE_MAX_ENTRIES", 3), patch(
+            "security.manager.time.monotonic", return_value=1010.0
+        ):
+            self.manager._has_token_cached(505)  # type: ignore[attr-defined]
+
+        self.assertEqual(list(cache), [505])
+
     def test_policy_error_for_unknown_level(self) -> None:
         user_id = 400
         unknown_level = SimpleNamespace(value="custom")
@@ -93,14 +232,6 @@ class PermissionManagerAdminTests(unittest.TestCase):
         self.assertEqual(DENIAL_MESSAGES[decision.reason], EXPECTED_DENIAL_MESSAGES[decision.reason])
 
 
-class DummyMessage:
-    def __init__(self) -> None:
-        self.sent: list[str] = []
-
-    async def reply_text(self, text: str) -> None:
-        self.sent.append(text)
-
-
 class InterceptorWhitelistAdminTests(unittest.IsolatedAsyncioTestCase):
     def setUp(self) -> None:
         self.tmpdir = tempfile.TemporaryDirectory()
@@ -109,11 +240,54 @@ class InterceptorWhitelistAdminTests(unittest.IsolatedAsyncioTestCase):
         self.env_path = Path(self.tmpdir.name) / ".env"
         self.env_path.write_text("USER_WHITELIST=100\n", encoding="utf-8")
 
-        os.environ["GOOGLE_TOKEN_DIR"] = self.tmpdir.name
-        self.addCleanup(lambda: os.environ.pop("GOOGLE_TOKEN_DIR", None))
+        env_patcher = patch.dict(os.environ, {"GOOGLE_TOKEN_DIR": self.tmpdir.name})
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
+
+        # monitoring binds LOG_DIR at import, so the audit writer is patched
+        # rather than redirected; secure() must not touch the repo's logs/.
+        # Other suites re-import security.interceptor, so patch the module
+        # object this file's secure() was imported from.
+        audit_patcher = patch.object(security_interceptor, "log_security_audit")
+        audit_patcher.start()
+        self.addCleanup(audit_patcher.stop)
 
         self.manager = PermissionManager(env_path=self.env_path, cache_ttl_seconds=1)
 
+    async def test_secure_binds_level_specific_evaluator(self) -> None:
+        expected = {
+            SecurityLevel.PUBLIC: self.manager._evaluate_public,  # type: ignore[attr-defined]
+            SecurityLevel.AUTHORIZED: self.manager._evaluate_authorized,  # type: ignore[attr-defined]
+            SecurityLevel.ADMIN: self.manager._evaluate_admin,  # type: ignore[attr-defined]
+        }
+        for level, evaluator in expected.items():
+            with self.subTest(level=level):
+                self.assertEqual(self.manager.evaluator_for(level), evaluator)
+
+                manager = MagicMock(policy_version="policy-v1", whitelist_version="wl-v1")
+                manager.evaluator_for.return_value = MagicMock(
+                    return_value=AccessDecision(True, AccessDecision.ALLOW, via="public")
+                )
+
+                @secure("bound_command", level, manager=manager)
+                async def handler(update, context):
+                    return "ok"
+
+                manager.evaluator_for.assert_called_once_with(level)
+
+                update = SimpleNamespace(
+                    effective_user=SimpleNamespace(id=100),
+                    effective_chat=SimpleNamespace(id=555, type="private"),
+                    effective_message=DummyMessage(),
+                )
+                context = SimpleNamespace(bot=SimpleNamespace(send_message=AsyncMock()))
+                with patch("security.interceptor.get_user_role", return_value="user"):
+                    result = await handler(update, context)
+
+                self.assertEqual(result, "ok")
+                manager.evaluator_for.return_value.assert_called_once_with(100)
+                manager.evaluate_access.assert_not_called()
+
     async def test_interceptor_denies_whitelisted_non_admin(self) -> None:
         user_id = 100
 
@@ -6,24 +6,9 @@ import sys
 import tempfile
 import unittest
 from types import SimpleNamespace
-from typing import List
 from unittest.mock import patch
 
-
-class DummyMessage:
-    def __init__(self) -> None:
-        self.sent: List[str] = []
-
-    async def reply_text(self, text: str) -> None:
-        self.sent.append(text)
-
-
-class DummyBot:
-    def __init__(self) -> None:
-        self.sent_messages: List[tuple[int, str]] = []
-
-    async def send_message(self, chat_id: int, text: str) -> None:
-        self.sent_messages.append((chat_id, text))
+from tests._helpers import DummyBot, DummyMessage
 
 
 class StatusCommandPermissionTests(unittest.IsolatedAsyncioTestCase):
@@ -32,16 +17,18 @@ class StatusCommandPermissionTests(unittest.IsolatedAsyncioTestCase):
         self.addCleanup(self.tmpdir.cleanup)
 
         self.log_dir = self.tmpdir.name
-        os.environ["LOG_DIRECTORY"] = self.log_dir
-        os.environ["USER_STORE_PATH"] = os.path.join(self.log_dir, "users.json")
-        os.environ["TELEGRAM_BOT_TOKEN"] = "dummy-token"
-        os.environ["GOOGLE_CLIENT_ID"] = "dummy-client"
-        os.environ["GOOGLE_CLIENT_SECRET"] = "dummy-secret"
-        self.addCleanup(lambda: os.environ.pop("LOG_DIRECTORY", None))
-        self.addCleanup(lambda: os.environ.pop("USER_STORE_PATH", None))
-        self.addCleanup(lambda: os.environ.pop("TELEGRAM_BOT_TOKEN", None))
-        self.addCleanup(lambda: os.environ.pop("GOOGLE_CLIENT_ID", None))
-        self.addCleanup(lambda: os.environ.pop("GOOGLE_CLIENT_SECRET", None))
+        env_patcher = patch.dict(
+            os.environ,
+            {
+                "LOG_DIRECTORY": self.log_dir,
+                "USER_STORE_PATH": os.path.join(self.log_dir, "users.json"),
+                "TELEGRAM_BOT_TOKEN": "dummy-token",
+                "GOOGLE_CLIENT_ID": "dummy-client",
+                "GOOGLE_CLIENT_SECRET": "dummy-secret",
+            },
+        )
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
 
         for module_name in ["permissions", "monitoring", "handlers.status_handler"]:
             if module_name in sys.modules:
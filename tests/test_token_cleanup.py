@@ -8,6 +8,7 @@ import time
 import unittest
 from datetime import datetime
 from pathlib import Path
+from unittest.mock import patch
 
 
 class TokenCleanupTests(unittest.TestCase):
@@ -16,15 +17,17 @@ class TokenCleanupTests(unittest.TestCase):
         self.addCleanup(self.tmpdir.cleanup)
         self.token_dir = Path(self.tmpdir.name)
 
-        os.environ["GOOGLE_TOKEN_DIR"] = self.tmpdir.name
-        os.environ["TELEGRAM_BOT_TOKEN"] = "dummy-token"
-        os.environ["GOOGLE_CLIENT_ID"] = "dummy-client"
-        os.environ["GOOGLE_CLIENT_SECRET"] = "dummy-secret"
-
-        self.addCleanup(lambda: os.environ.pop("GOOGLE_TOKEN_DIR", None))
-        self.addCleanup(lambda: os.environ.pop("TELEGRAM_BOT_TOKEN", None))
-        self.addCleanup(lambda: os.environ.pop("GOOGLE_CLIENT_ID", None))
-        self.addCleanup(lambda: os.environ.pop("GOOGLE_CLIENT_SECRET", None))
+        env_patcher = patch.dict(
+            os.environ,
+            {
+                "GOOGLE_TOKEN_DIR": self.tmpdir.name,
+                "TELEGRAM_BOT_TOKEN": "dummy-token",
+                "GOOGLE_CLIENT_ID": "dummy-client",
+                "GOOGLE_CLIENT_SECRET": "dummy-secret",
+            },
+        )
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
 
         for module_name in ("puzzling.token_cleanup", "puzzling", "creds"):
             sys.modules.pop(module_name, None)
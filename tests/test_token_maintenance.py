@@ -66,6 +66,14 @@ class _DummyStore:
         yield
 
 
+def _flush_log_pool() -> None:
+    from security import maintenance
+
+    # The log pool has a single worker, so a no-op completes only after every
+    # previously submitted log task.
+    maintenance._LOG_POOL.submit(lambda: None).result(timeout=5)
+
+
 class TokenMaintenanceTests(unittest.TestCase):
     def setUp(self) -> None:
         self.tempdir = tempfile.TemporaryDirectory()
@@ -90,6 +98,112 @@ class TokenMaintenanceTests(unittest.TestCase):
     def tearDown(self) -> None:
         self.tempdir.cleanup()
 
+    def test_select_batch_wraps_around_the_ring(self) -> None:
+        from security import maintenance
+
+        user_ids = [10, 20, 30, 40, 50]
+        cases = [
+            (0, 2, [10, 20], 2),
+            (3, 2, [40, 50], 0),
+            (4, 3, [50, 10, 20], 2),
+            (7, 5, [30, 40, 50, 10, 20], 2),
+            (1, 9, [20, 30, 40, 50, 10], 1),
+        ]
+        for cursor, batch_size, expected, next_cursor in cases:
+            with self.subTest(cursor=cursor, batch_size=batch_size):
+                self.assertEqual(
+                    maintenance._select_batch(user_ids, cursor, batch_size),
+                    (expected, next_cursor),
+                )
+        self.assertEqual(maintenance._select_batch([], 3, 2), ([], 3))
+
+    def test_collect_token_ids_ignores_non_numeric_token_names(self) -> None:
+        for name in ("token_.json", "token_abc.json", "token_12.json.bak", "token.json"):
+            (self.base_dir / name).write_text("{}", encoding="utf-8")
+        (self.base_dir / "token_7.json").write_text("{}", encoding="utf-8")
+
+        from security import maintenance
+
+        user_ids = maintenance._collect_token_ids(_DummyStore(self.base_dir, {}, {}))
+
+        self.assertEqual(user_ids, [1, 2, 3, 4, 5, 7])
+
+    def test_parallel_batch_merges_metrics_and_keeps_batch_order(self) -> None:
+        now = datetime.now(timezone.utc)
+        gauth_refresh = _DummyGAuth(now + timedelta(minutes=5))
+
+        def valid(user_id: int, gauth: _DummyGAuth | None = None) -> TokenLoadResult:
+            return TokenLoadResult(
+                user_id=user_id,
+                path=self.base_dir / f"token_{user_id}.json",
+                state=TokenState.VALID,
+                gauth=gauth or _DummyGAuth(now + timedelta(days=2)),
+            )
+
+        prepare_map = {
+            1: valid(1, gauth_refresh),
+            2: TokenLoadResult(
+                user_id=2,
+                path=self.base_dir / "token_2.json",
+                state=TokenState.CORRUPTED,
+                gauth=None,
+                error="invalid",
+            ),
+            3: valid(3),
+            4: valid(4),
+            5: valid(5),
+        }
+        refresh_map = {
+            1: TokenLoadResult(
+                user_id=1,
+                path=self.base_dir / "token_1.json",
+                state=TokenState.VALID,
+                gauth=gauth_refresh,
+                refreshed=True,
+            ),
+        }
+        store = _DummyStore(self.base_dir, prepare_map, refresh_map, lock_failures={5})
+        context = SimpleNamespace(
+            job=SimpleNamespace(
+                data={"batch_size": 5, "refresh_ahead": timedelta(minutes=30), "cursor": 3}
+            )
+        )
+
+        from security import maintenance
+
+        log_pool = MagicMock()
+        with patch("security.maintenance.token_store", return_value=store), patch(
+            "security.maintenance._LOG_POOL", log_pool
+        ):
+            maintenance.run_token_health_check(context)
+
+        log_pool.submit.assert_called_once()
+        emit, metrics, total_users, results = log_pool.submit.call_args.args
+        self.assertIs(emit, maintenance._emit_maintenance_logs)
+        self.assertEqual(total_users, 5)
+        self.assertEqual([result.user_id for result in results], [4, 1, 2, 3])
+        self.assertEqual(metrics.processed, 4)
+        self.assertEqual(metrics.refresh_attempts, 1)
+        self.assertEqual(metrics.refreshed, 1)
+        self.assertEqual(metrics.refresh_failures, 0)
+        self.assertEqual(metrics.quarantined, 1)
+        self.assertEqual(metrics.skipped, 1)
+        self.assertEqual(store.quarantine_calls, [(2, "invalid")])
+        self.assertEqual(context.job.data["cursor"], 3)
+
+    def test_log_failures_are_swallowed_and_logged(self) -> None:
+        from security import maintenance
+
+        metrics = maintenance._MaintenanceMetrics(processed=1)
+        with patch(
+            "security.maintenance._log_maintenance_outcome",
+            side_effect=OSError("disk full"),
+        ) as outcome, self.assertLogs("security.maintenance", level="ERROR") as logs:
+            maintenance._emit_maintenance_logs(metrics, 1, [])
+
+        outcome.assert_called_once_with(metrics, 1, [])
+        self.assertIn("Failed to emit token maintenance logs: disk full", logs.output[0])
+
     def test_health_check_reports_and_quarantines(self) -> None:
         now = datetime.now(timezone.utc)
 
@@ -167,8 +281,11 @@ class TokenMaintenanceTests(unittest.TestCase):
 
         from security import maintenance
 
-        with patch("security.maintenance.token_store", return_value=store):
+        with patch("security.maintenance.token_store", return_value=store) as resolve_store:
             maintenance.run_token_health_check(context)
+            _flush_log_pool()
+
+        resolve_store.assert_called_once_with()
 
         # Ensure cursor persists so polling loop is unaffected
         self.assertEqual(context.job.data["cursor"], 0)
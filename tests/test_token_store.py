@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import asyncio
+import stat
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+from unittest.mock import patch
+
+from security.token_store import TokenLoadResult, TokenState, TokenStore
+
+
+class TokenStoreLockTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.base_dir = Path(self.tmpdir.name)
+        self.store = TokenStore(base_dir=self.base_dir)
+
+    def test_file_lock_excludes_other_holders_until_released(self) -> None:
+        lock_path = self.base_dir / "token_3.json.lock"
+
+        with self.store._file_lock(lock_path):  # type: ignore[attr-defined]
+            with self.assertRaises(TimeoutError):
+                with self.store._file_lock(lock_path, timeout=0.05):  # type: ignore[attr-defined]
+                    pass
+
+        with self.store._file_lock(lock_path, timeout=0.05):  # type: ignore[attr-defined]
+            pass
+
+    def test_user_lock_entry_dropped_after_release(self) -> None:
+        with self.store._user_lock(1):  # type: ignore[attr-defined]
+            self.assertIn(1, self.store._locks)  # type: ignore[attr-defined]
+
+        self.assertEqual(self.store._locks, {})  # type: ignore[attr-defined]
+
+    def test_user_lock_serialises_waiters_on_same_entry(self) -> None:
+        holder_ready = threading.Event()
+        release_holder = threading.Event()
+        order: list[str] = []
+
+        def holder() -> None:
+            with self.store._user_lock(7):  # type: ignore[attr-defined]
+                holder_ready.set()
+                release_holder.wait(timeout=5)
+                order.append("holder")
+
+        def waiter() -> None:
+            holder_ready.wait(timeout=5)
+            with self.store._user_lock(7):  # type: ignore[attr-defined]
+                order.append("waiter")
+
+        threads = [threading.Thread(target=holder), threading.Thread(target=waiter)]
+        for thread in threads:
+            thread.start()
+        holder_ready.wait(timeout=5)
+        while self.store._locks[7].users < 2:  # type: ignore[attr-defined]
+            time.sleep(0.001)
+        release_holder.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        self.assertEqual(order, ["holder", "waiter"])
+        self.assertEqual(self.store._locks, {})  # type: ignore[attr-defined]
+
+
+class TokenLoadResultTests(unittest.TestCase):
+    def test_as_metadata_is_built_once(self) -> None:
+        fields = dict(
+            user_id=3,
+            path=Path("token_3.json"),
+            state=TokenState.CORRUPTED,
+            error="invalid",
+            quarantined_to=Path("quarantine/token_3.json"),
+            latency_ms=1.23456,
+        )
+        result = TokenLoadResult(**fields)
+
+        metadata = result.as_metadata()
+
+        self.assertIs(result.as_metadata(), metadata)
+        self.assertEqual(
+            metadata,
+            {
+                "user_id": 3,
+                "path": "token_3.json",
+                "state": "corrupted",
+                "refreshed": False,
+                "error": "invalid",
+                "quarantined_to": str(Path("quarantine/token_3.json")),
+                "latency_ms": 1.235,
+            },
+        )
+        # The cached dict does not take part in equality.
+        self.assertEqual(result, TokenLoadResult(**fields))
+
+
+class TokenStoreCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.base_dir = Path(self.tmpdir.name)
+        self.store = TokenStore(base_dir=self.base_dir)
+        self.token_path = self.base_dir / "token_5.json"
+        self.token_path.write_text("{}", encoding="utf-8")
+        stat = self.token_path.stat()
+        self.result = TokenLoadResult(user_id=5, path=self.token_path, state=TokenState.VALID)
+        patcher = patch.object(self.store, "get_token_path", return_value=self.token_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with patch("security.token_store.time.perf_counter", return_value=1000.0):
+            self.store._update_cache(  # type: ignore[attr-defined]
+                5, self.result, mtime=stat.st_mtime, size=stat.st_size
+            )
+
+    def test_cache_evicts_least_recently_used_entry(self) -> None:
+        store = TokenStore(base_dir=self.base_dir, max_cache_entries=2)
+        for user_id in (1, 2):
+            store._update_cache(  # type: ignore[attr-defined]
+                user_id, TokenLoadResult(user_id=user_id, path=self.token_path, state=TokenState.ABSENT)
+            )
+
+        store._load(1)  # type: ignore[attr-defined]
+        store._update_cache(  # type: ignore[attr-defined]
+            3, TokenLoadResult(user_id=3, path=self.token_path, state=TokenState.ABSENT)
+        )
+
+        self.assertEqual(list(store._cache), [1, 3])  # type: ignore[attr-defined]
+
+    def test_token_path_is_memoised_per_user(self) -> None:
+        store = TokenStore(base_dir=self.base_dir)
+
+        first = store.get_token_path(42)
+
+        self.assertIs(store.get_token_path("42"), first)  # type: ignore[arg-type]
+        self.assertEqual(first.name, "token_42.json")
+
+    def test_recent_hit_skips_stat(self) -> None:
+        with patch("security.token_store.time.perf_counter", return_value=1002.0), patch.object(
+            Path, "stat", side_effect=AssertionError("stat called")
+        ):
+            self.assertIs(self.store._load(5), self.result)  # type: ignore[attr-defined]
+
+    def test_older_hit_revalidates_with_stat(self) -> None:
+        with patch("security.token_store.time.perf_counter", return_value=1010.0), patch.object(
+            Path, "stat", autospec=True, side_effect=Path.stat
+        ) as path_stat:
+            self.assertIs(self.store._load(5), self.result)  # type: ignore[attr-defined]
+
+        path_stat.assert_any_call(self.token_path)
+        self.assertEqual(self.store._cache[5].checked_at, 1010.0)  # type: ignore[attr-defined]
+
+    def test_lapsed_access_token_bypasses_cache(self) -> None:
+        credentials = SimpleNamespace(token_expiry=datetime(2024, 1, 1, 0, 0, 0))
+        result = TokenLoadResult(
+            user_id=5,
+            path=self.token_path,
+            state=TokenState.VALID,
+            gauth=SimpleNamespace(credentials=credentials),  # type: ignore[arg-type]
+        )
+        with patch("security.token_store.time.perf_counter", return_value=1000.0):
+            self.store._update_cache(5, result)  # type: ignore[attr-defined]
+        entry = self.store._cache[5]  # type: ignore[attr-defined]
+        self.assertEqual(entry.expiry_ts, 1704067200.0)
+
+        with patch("security.token_store.time.perf_counter", return_value=1001.0), patch(
+            "security.token_store.time.time", return_value=1704067199.0
+        ):
+            self.assertIs(self.store._load(5), result)  # type: ignore[attr-defined]
+
+        with patch("security.token_store.time.perf_counter", return_value=1001.0), patch(
+            "security.token_store.time.time", return_value=1704067200.0
+        ), patch("security.token_store.GoogleAuth", side_effect=RuntimeError("reloaded")):
+            with self.assertRaisesRegex(RuntimeError, "reloaded"):
+                self.store._load(5)  # type: ignore[attr-defined]
+
+
+class TokenStoreSaveTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.base_dir = Path(self.tmpdir.name)
+        self.store = TokenStore(base_dir=self.base_dir)
+        self.token_path = self.base_dir / "token_9.json"
+
+    def test_atomic_save_writes_serialised_credentials_privately(self) -> None:
+        credentials = SimpleNamespace(to_json=lambda: '{"refresh_token": "r"}')
+        gauth = SimpleNamespace(credentials=credentials)
+
+        self.store._atomic_save(9, gauth, self.token_path)  # type: ignore[attr-defined]
+
+        self.assertEqual(self.token_path.read_text(encoding="utf-8"), '{"refresh_token": "r"}')
+        self.assertEqual(stat.S_IMODE(self.token_path.stat().st_mode), 0o600)
+        self.assertEqual(list(self.base_dir.glob("tmp_token_*")), [])
+
+    def test_atomic_save_rejects_missing_credentials(self) -> None:
+        with self.assertRaises(ValueError):
+            self.store._atomic_save(  # type: ignore[attr-defined]
+                9, SimpleNamespace(credentials=None), self.token_path
+            )
+
+        self.assertFalse(self.token_path.exists())
+
+
+class TokenStoreConfigureTests(unittest.TestCase):
+    def test_configure_gauth_applies_template_and_per_user_paths(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            base_dir = Path(tmpdir)
+            store = TokenStore(base_dir=base_dir)
+            first = SimpleNamespace(settings={"auth_param": {"login_hint": "a@example.com"}})
+            second = SimpleNamespace(settings={})
+
+            store.configure_gauth(first, base_dir / "token_1.json")  # type: ignore[arg-type]
+            store.configure_gauth(second, base_dir / "token_2.json")  # type: ignore[arg-type]
+
+        self.assertEqual(first.settings["save_credentials_file"], str(base_dir / "token_1.json"))
+        self.assertEqual(second.settings["save_credentials_file"], str(base_dir / "token_2.json"))
+        self.assertEqual(first.settings["save_credentials_dir"], str(base_dir))
+        self.assertTrue(first.settings["save_credentials"])
+        self.assertEqual(first.settings["client_config_backend"], "file")
+        self.assertEqual(
+            first.settings["auth_param"],
+            {"login_hint": "a@example.com", "access_type": "offline", "prompt": "consent"},
+        )
+        self.assertEqual(second.settings["auth_param"], {"access_type": "offline", "prompt": "consent"})
+        self.assertIsNot(first.settings["auth_param"], second.settings["auth_param"])
+        self.assertIsNot(first.settings["oauth_scope"], second.settings["oauth_scope"])
+
+
+class TokenStoreAsyncPrepareTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.base_dir = Path(self.tmpdir.name)
+        self.store = TokenStore(base_dir=self.base_dir)
+        self.token_path = self.base_dir / "token_13.json"
+
+    async def test_expired_token_is_refreshed_off_loop_and_lock_released(self) -> None:
+        gauth = object()
+        expired = TokenLoadResult(
+            user_id=13, path=self.token_path, state=TokenState.EXPIRED, gauth=gauth  # type: ignore[arg-type]
+        )
+        refreshed = TokenLoadResult(user_id=13, path=self.token_path, state=TokenState.VALID)
+        loop_thread = threading.get_ident()
+        load_threads: list[int] = []
+
+        def fake_load(user_id: int) -> TokenLoadResult:
+            load_threads.append(threading.get_ident())
+            return expired
+
+        with patch.object(self.store, "_load", side_effect=fake_load), patch.object(
+            self.store, "refresh", return_value=refreshed
+        ) as refresh:
+            results = await asyncio.gather(
+                self.store.prepare_gauth_async(13), self.store.prepare_gauth_async(13)
+            )
+
+        self.assertEqual(results, [refreshed, refreshed])
+        self.assertNotIn(loop_thread, load_threads)
+        refresh.assert_called_with(13, gauth)
+        self.assertEqual(self.store._async_locks, {})  # type: ignore[attr-defined]
+
+
+class TokenStoreRefreshFailureTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.base_dir = Path(self.tmpdir.name)
+        self.store = TokenStore(base_dir=self.base_dir)
+        self.token_path = self.base_dir / "token_11.json"
+        self.token_path.write_text("{}", encoding="utf-8")
+
+    def _fail_at(self, timestamp: float) -> TokenLoadResult:
+        with patch("security.token_store.time.monotonic", return_value=timestamp):
+            return self.store._handle_refresh_failure(  # type: ignore[attr-defined]
+                11, self.token_path, RuntimeError("boom"), 0.0
+            )
+
+    def test_third_failure_inside_window_quarantines(self) -> None:
+        self.assertIsNone(self._fail_at(0.0).quarantined_to)
+        self.assertIsNone(self._fail_at(3600.0).quarantined_to)
+
+        result = self._fail_at(7200.0)
+
+        self.assertIsNotNone(result.quarantined_to)
+        self.assertFalse(self.token_path.exists())
+
+    def test_failures_spread_beyond_window_do_not_quarantine(self) -> None:
+        for timestamp in (0.0, 50_000.0, 100_000.0):
+            result = self._fail_at(timestamp)
+
+        self.assertIsNone(result.quarantined_to)
+        self.assertTrue(self.token_path.exists())
+        self.assertEqual(len(self.store._refresh_failures[11]), 3)  # type: ignore[attr-defined]
+
+    def test_public_quarantine_records_result_in_cache(self) -> None:
+        with patch.object(self.store, "get_token_path", return_value=self.token_path), patch.object(
+            self.store, "_update_cache", wraps=self.store._update_cache  # type: ignore[attr-defined]
+        ) as update_cache:
+            destination = self.store.quarantine(11, "invalid_credentials")
+
+        self.assertIsNotNone(destination)
+        update_cache.assert_called_once()
+        cached = self.store._cache[11].result  # type: ignore[attr-defined]
+        self.assertIs(cached.state, TokenState.CORRUPTED)
+        self.assertEqual(cached.quarantined_to, destination)
+        self.assertEqual(cached.error, "invalid_credentials")
+
+    def test_refresh_failure_quarantine_updates_cache_once(self) -> None:
+        self._fail_at(0.0)
+        self._fail_at(1.0)
+        with patch.object(
+            self.store, "_update_cache", wraps=self.store._update_cache  # type: ignore[attr-defined]
+        ) as update_cache:
+            result = self._fail_at(2.0)
+
+        self.assertIsNotNone(result.quarantined_to)
+        update_cache.assert_called_once()
+
+    def test_concurrent_corrupt_loads_quarantine_once(self) -> None:
+        first = self.store._quarantine_corrupted(  # type: ignore[attr-defined]
+            11, self.token_path, "load_error", "bad json", 0.0
+        )
+        with patch.object(
+            self.store, "_quarantine_file", side_effect=AssertionError("quarantined twice")
+        ):
+            second = self.store._quarantine_corrupted(  # type: ignore[attr-defined]
+                11, self.token_path, "load_error", "missing file", 0.0
+            )
+
+        self.assertIsNotNone(first.quarantined_to)
+        self.assertIs(second, first)
+        self.assertEqual(len(list((self.base_dir / "quarantine").iterdir())), 1)
+
+    def test_successful_store_forgets_failures(self) -> None:
+        self._fail_at(0.0)
+        gauth = SimpleNamespace(credentials=SimpleNamespace(to_json=lambda: "{}"))
+
+        with patch.object(self.store, "get_token_path", return_value=self.token_path):
+            self.store.store(11, gauth)  # type: ignore[arg-type]
+
+        self.assertEqual(self.store._refresh_failures, {})  # type: ignore[attr-defined]
+
+
+if __name__ == "__main__":
+    unittest.main()